@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+GPU admission control: bounded concurrency, bounded wait queue and backpressure
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and a Retry-After hint"""
+
+    def __init__(self, reason, status_code, retry_after, in_flight, queued):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.in_flight = in_flight
+        self.queued = queued
+
+
+class AdmissionController:
+    """Allows at most max_concurrent GPU jobs, with up to max_queue requests waiting.
+
+    A request that finds the queue full is rejected immediately with 429; one that
+    waits longer than its queue timeout is rejected with 503. Both carry a
+    Retry-After estimate derived from recent service times.
+
+    With a memory budget, each job also reserves its estimated peak memory and
+    waits while the reservations of running jobs would exceed the budget. A
+    job on an idle GPU is always admitted, even when its estimate alone is over.
+    """
+
+    def __init__(self, max_concurrent=1, max_queue=16, queue_timeout=30.0, memory_budget=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.memory_budget = memory_budget
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+        self._service_seconds = None
+        self._memory_reserved = 0
+        self._memory_waits = 0
+
+    def _retry_after(self):
+        """Seconds until a slot is likely to free up (lock held)"""
+        if self._service_seconds is None:
+            return 5
+        waves = self._queued / self.max_concurrent + 1
+        return min(300, max(1, math.ceil(self._service_seconds * waves)))
+
+    def _reject(self, reason, status_code):
+        return AdmissionRejected(reason, status_code, self._retry_after(), self._in_flight, self._queued)
+
+    def _memory_blocked(self, memory):
+        """True when memory does not fit next to the running jobs' reservations (lock held)"""
+        return (self.memory_budget is not None and self._in_flight > 0
+                and self._memory_reserved + memory > self.memory_budget)
+
+    def _blocked(self, memory):
+        return self._in_flight >= self.max_concurrent or self._memory_blocked(memory)
+
+    def set_memory_budget(self, memory_budget):
+        """Bytes that running jobs may reserve in total; None disables memory-aware admission"""
+        with self._cond:
+            self.memory_budget = memory_budget
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, timeout=None, bounded=True, memory=0):
+        """Hold a GPU slot (and reserve memory bytes of the budget) for the duration of the block.
+
+        timeout overrides the default queue timeout. bounded=False skips the
+        queue-size check and waits indefinitely (for callers such as the job
+        pool that already bound their own backlog).
+        """
+        timeout = self.queue_timeout if timeout is None else float(timeout)
+        with self._cond:
+            if self._blocked(memory):
+                if bounded and self._queued >= self.max_queue:
+                    self._rejected_full += 1
+                    raise self._reject('queue_full', 429)
+                if self._in_flight < self.max_concurrent:
+                    self._memory_waits += 1
+                deadline = time.time() + timeout
+                self._queued += 1
+                try:
+                    while self._blocked(memory):
+                        remaining = deadline - time.time()
+                        if bounded and remaining <= 0:
+                            self._rejected_timeout += 1
+                            raise self._reject('queue_timeout', 503)
+                        self._cond.wait(remaining if bounded else None)
+                finally:
+                    self._queued -= 1
+            self._in_flight += 1
+            self._admitted += 1
+            self._memory_reserved += memory
+
+        started = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - started
+            with self._cond:
+                self._in_flight -= 1
+                self._memory_reserved -= memory
+                if self._service_seconds is None:
+                    self._service_seconds = elapsed
+                else:
+                    self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+                # Waiters need different amounts of memory, so any of them may fit now
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'admitted': self._admitted,
+                'rejected_queue_full': self._rejected_full,
+                'rejected_queue_timeout': self._rejected_timeout,
+                'service_seconds_ema': self._service_seconds,
+                'memory_budget_bytes': self.memory_budget,
+                'memory_reserved_bytes': self._memory_reserved,
+                'memory_waits': self._memory_waits,
+            }
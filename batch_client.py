@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Batch client: runs a JSONL manifest of generation requests against the endpoint
+
+Each manifest line is one request body as sent to /invocations, plus an
+optional "id" (defaults to the line number) and "image_path" (a local image
+read and base64-encoded when the request is sent, instead of "image").
+
+Usage:
+    python batch_client.py manifest.jsonl --endpoint-name hunyuan3d-custom-endpoint --output-dir out/
+    python batch_client.py manifest.jsonl --url http://localhost:8080 --output-dir out/   # local stand-in
+"""
+import argparse
+import base64
+import http.client
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Responses worth retrying: model still loading, admission rejections and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+BINARY_ACCEPT = 'model/gltf-binary'
+CHUNK_BYTES = 1024 * 1024
+
+
+class RetryableError(Exception):
+    """A response or connection failure that may succeed when retried"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Response:
+    """Transport-neutral response: status, content type, custom attributes and a chunk iterator"""
+
+    def __init__(self, status, content_type, attributes, chunks, retry_after=None):
+        self.status = status
+        self.content_type = content_type or ''
+        self.attributes = attributes or ''
+        self.chunks = chunks
+        self.retry_after = retry_after
+
+    def read(self):
+        return b''.join(self.chunks)
+
+
+class HttpTransport:
+    """Local stand-in (python serve, or any server with /invocations) over keep-alive connections.
+
+    Each thread keeps one persistent connection, so the pool is as large as
+    the concurrency and connections are reused across requests.
+    """
+
+    def __init__(self, url, timeout=900):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = (parts.path.rstrip('/') or '') + '/invocations'
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def invoke(self, body, accept):
+        conn = self._connection()
+        try:
+            conn.request('POST', self.path, body=body, headers={
+                'Content-Type': 'application/json',
+                'Accept': accept,
+            })
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._local.conn = None
+            raise RetryableError(f"connection failed: {e}")
+
+        def chunks():
+            try:
+                while True:
+                    chunk = response.read(CHUNK_BYTES)
+                    if not chunk:
+                        return
+                    yield chunk
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                raise
+
+        return Response(response.status, response.getheader('Content-Type'),
+                        response.getheader('X-Amzn-SageMaker-Custom-Attributes'), chunks(),
+                        retry_after=response.getheader('Retry-After'))
+
+
+class SageMakerTransport:
+    """invoke_endpoint through one shared boto3 client with a connection pool sized to the concurrency"""
+
+    def __init__(self, endpoint_name, region, concurrency, timeout=900):
+        import boto3
+        from botocore.config import Config
+
+        self.endpoint_name = endpoint_name
+        # Retries are done here (with jitter and our own status handling), not inside botocore
+        self.client = boto3.client('sagemaker-runtime', region_name=region, config=Config(
+            max_pool_connections=concurrency,
+            read_timeout=timeout,
+            retries={'max_attempts': 0},
+        ))
+
+    def invoke(self, body, accept):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            response = self.client.invoke_endpoint(
+                EndpointName=self.endpoint_name,
+                ContentType='application/json',
+                Accept=accept,
+                Body=body,
+            )
+        except ClientError as e:
+            # ModelError carries the container's status code; throttling and service errors their own
+            status = e.response.get('OriginalStatusCode') or e.response['ResponseMetadata']['HTTPStatusCode']
+            message = e.response.get('OriginalMessage') or str(e)
+            return Response(int(status), 'application/json', '', iter([message.encode()]))
+        except BotoCoreError as e:
+            raise RetryableError(f"connection failed: {e}")
+        return Response(200, response['ContentType'], response.get('CustomAttributes'),
+                        response['Body'].iter_chunks(chunk_size=CHUNK_BYTES))
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished requests; ids in it are skipped on the next run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        self.done.add(str(json.loads(line)['id']))
+                    except (ValueError, KeyError):
+                        # A line cut short by an interrupted run
+                        continue
+        self._lock = threading.Lock()
+        self._file = open(path, 'a') if path else None
+
+    def record(self, entry):
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def read_manifest(path):
+    """Yield (id, request) pairs without loading the whole manifest"""
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            request = json.loads(line)
+            yield str(request.pop('id', number)), request
+
+
+def build_body(request):
+    if 'image_path' in request:
+        request = dict(request)
+        with open(request.pop('image_path'), 'rb') as f:
+            request['image'] = base64.b64encode(f.read()).decode()
+    return json.dumps(request).encode()
+
+
+def _write_atomic(path, chunks):
+    """Write chunks as they arrive to a temporary file, then move it into place"""
+    size = 0
+    with open(path + '.part', 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(path + '.part', path)
+    return size
+
+
+def _attributes(header):
+    return dict(item.split('=', 1) for item in header.split(',') if '=' in item)
+
+
+def save_result(request_id, response, output_dir, file_type):
+    """Store the mesh(es) of a successful response; returns (files, bytes written)"""
+    suffix = {'gzip': '.gz', 'zstd': '.zst'}
+    if not response.content_type.startswith('application/json'):
+        encoding = _attributes(response.attributes).get('content_encoding')
+        path = os.path.join(output_dir, f'{request_id}.{file_type}{suffix.get(encoding, "")}')
+        return [path], _write_atomic(path, response.chunks)
+
+    result = json.loads(response.read())
+    if result.get('status') == 'loading':
+        raise RetryableError('model loading')
+    if result.get('status') != 'completed':
+        raise RuntimeError(result.get('error') or f"status {result.get('status')}")
+    file_type = result.get('type', file_type)
+    extension = f'{file_type}{suffix.get(result.get("content_encoding"), "")}'
+
+    # Several levels of detail or seed variants: one file per entry
+    outputs = [(f'{request_id}.{extension}', result)]
+    for key, label in (('lods', 'lod'), ('variants', 'seed')):
+        if key in result:
+            outputs = [(f'{request_id}_{label}{part.get("level", part.get("seed"))}.{extension}', part)
+                       for part in result[key]]
+    files, size = [], 0
+    for name, entry in outputs:
+        path = os.path.join(output_dir, name)
+        size += _write_atomic(path, [base64.b64decode(entry['model_base64'])])
+        files.append(path)
+    return files, size
+
+
+class BatchRunner:
+    """Sends manifest requests with bounded concurrency and retries with jittered exponential backoff"""
+
+    def __init__(self, transport, output_dir, checkpoint, concurrency=4, max_attempts=6,
+                 backoff_base=1.0, backoff_max=60.0, accept=BINARY_ACCEPT):
+        self.transport = transport
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.accept = accept
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.counts = {'completed': 0, 'failed': 0, 'skipped': 0, 'retries': 0}
+        self.bytes_written = 0
+
+    def _delay(self, attempt, retry_after=None):
+        # Full jitter keeps many clients from retrying in lockstep; Retry-After is a floor
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _attempt(self, request_id, body, file_type):
+        response = self.transport.invoke(body, self.accept)
+        if response.status in RETRY_STATUS_CODES:
+            detail = response.read()[:200].decode(errors='replace')
+            raise RetryableError(f"HTTP {response.status}: {detail}", retry_after=response.retry_after)
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {response.read()[:200].decode(errors='replace')}")
+        return save_result(request_id, response, self.output_dir, file_type)
+
+    def run_one(self, request_id, request):
+        body = build_body(request)
+        file_type = request.get('type', 'glb')
+        start = time.perf_counter()
+        files, size, error = None, 0, None
+        for attempt in range(self.max_attempts):
+            try:
+                files, size = self._attempt(request_id, body, file_type)
+                break
+            except RetryableError as e:
+                error = str(e)
+                if attempt + 1 < self.max_attempts:
+                    with self._lock:
+                        self.counts['retries'] += 1
+                    time.sleep(self._delay(attempt, e.retry_after))
+            except Exception as e:
+                error = str(e)
+                break
+
+        latency = time.perf_counter() - start
+        entry = {'id': request_id, 'attempts': attempt + 1, 'latency_seconds': round(latency, 3)}
+        if files is not None:
+            entry.update(status='completed', files=files, bytes=size)
+        else:
+            entry.update(status='failed', error=error)
+        with self._lock:
+            self.counts[entry['status']] += 1
+            if entry['status'] == 'completed':
+                self.latencies.append(latency)
+                self.bytes_written += size
+        # Failed requests are not checkpointed, so a rerun retries them
+        if entry['status'] == 'completed':
+            self.checkpoint.record(entry)
+        print(json.dumps(entry), flush=True)
+        return entry
+
+    def run(self, manifest):
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Bounded window: the manifest is read as requests finish, never all at once
+        window = threading.BoundedSemaphore(self.concurrency * 2)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for request_id, request in read_manifest(manifest):
+                if request_id in self.checkpoint.done:
+                    self.counts['skipped'] += 1
+                    continue
+                window.acquire()
+                future = executor.submit(self.run_one, request_id, request)
+                future.add_done_callback(lambda _: window.release())
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        summary = dict(self.counts, elapsed_seconds=round(elapsed, 3), bytes_written=self.bytes_written,
+                       throughput_per_second=round(self.counts['completed'] / elapsed, 3) if elapsed else 0.0)
+        if latencies:
+            summary['latency_seconds'] = {
+                'mean': round(statistics.mean(latencies), 3),
+                **{f'p{q}': round(percentile(latencies, q), 3) for q in (50, 90, 99)},
+                'max': round(latencies[-1], 3),
+            }
+        return summary
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('manifest', help='JSONL file, one request per line')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--endpoint-name', help='SageMaker endpoint name')
+    target.add_argument('--url', help='base URL of a local stand-in, e.g. http://localhost:8080')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--output-dir', default='batch_output')
+    parser.add_argument('--checkpoint', help='resume file (default: <output-dir>/checkpoint.jsonl)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--max-attempts', type=int, default=6)
+    parser.add_argument('--backoff-base', type=float, default=1.0, help='seconds, doubled per attempt')
+    parser.add_argument('--backoff-max', type=float, default=60.0)
+    parser.add_argument('--json-response', action='store_true', help='request base64-in-JSON instead of binary')
+    parser.add_argument('--summary', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        transport = SageMakerTransport(args.endpoint_name, args.region, args.concurrency)
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.output_dir, 'checkpoint.jsonl'))
+
+    runner = BatchRunner(
+        transport, args.output_dir, checkpoint,
+        concurrency=args.concurrency,
+        max_attempts=args.max_attempts,
+        backoff_base=args.backoff_base,
+        backoff_max=args.backoff_max,
+        accept='application/json' if args.json_response else BINARY_ACCEPT,
+    )
+    try:
+        summary = runner.run(args.manifest)
+    finally:
+        checkpoint.close()
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
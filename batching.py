@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching scheduler for shape generation
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the queue wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class _ShapeRequest:
+    def __init__(self, image, seed, key, timings):
+        self.image = image
+        self.seed = seed
+        self.key = key
+        self.timings = timings
+        self.future = Future()
+        self.enqueued_at = time.time()
+
+
+class ShapeBatcher:
+    """Collects concurrent shape requests and runs them as one batched pipeline call.
+
+    Requests are grouped by (num_inference_steps, guidance_scale, octree_resolution)
+    since only those can share a single DiT flow-matching pass. Each request keeps
+    its own seed, so the batch is run with one generator per item.
+    """
+
+    def __init__(self, run_batch, max_batch_size=4, max_wait_ms=10):
+        # run_batch(images, seeds, octree_resolution, num_inference_steps, guidance_scale, timings) -> meshes
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = defaultdict(int)
+        self._wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._requests = 0
+        self._batches = 0
+        self._failed_batches = 0
+        self._isolated_retries = 0
+
+        self._worker = threading.Thread(target=self._run, name='shape-batcher', daemon=True)
+        self._worker.start()
+        logger.info(f"Shape batcher started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_ms={self.max_wait * 1000:.0f})")
+
+    def submit(self, image, seed=1234, octree_resolution=128, num_inference_steps=5, guidance_scale=5.0,
+               timings=None):
+        """Queue one image for shape generation, returns a Future resolving to its mesh"""
+        key = (int(num_inference_steps), float(guidance_scale), int(octree_resolution))
+        item = _ShapeRequest(image, int(seed), key, timings)
+        with self._cond:
+            self._pending.append(item)
+            self._cond.notify()
+        return item.future
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _take_batch(self):
+        """Block until a batch is ready: full, or the oldest request has waited max_wait"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            head = self._pending[0]
+            deadline = head.enqueued_at + self.max_wait
+            while True:
+                compatible = [item for item in self._pending if item.key == head.key]
+                remaining = deadline - time.time()
+                if len(compatible) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = compatible[:self.max_batch_size]
+            taken = set(map(id, batch))
+            self._pending = [item for item in self._pending if id(item) not in taken]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            started = time.time()
+            self._record(batch, started)
+            for item in batch:
+                if item.timings is not None:
+                    item.timings.add('batch_wait', started - item.enqueued_at)
+
+            try:
+                self._run_items(batch)
+            except Exception as e:
+                logger.error(f"Batched shape generation failed: {str(e)}")
+                with self._stats_lock:
+                    self._failed_batches += 1
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                    continue
+                # One bad input (or an OOM at this batch size) must not fail the other requests:
+                # run every item on its own, so only the ones that fail by themselves get an error
+                logger.info(f"Retrying the {len(batch)} requests of the failed batch one at a time")
+                for item in batch:
+                    with self._stats_lock:
+                        self._isolated_retries += 1
+                    try:
+                        self._run_items([item])
+                    except Exception as item_error:
+                        item.future.set_exception(item_error)
+
+    def _run_items(self, items):
+        """One pipeline call for items (all with the same key); resolves their futures with the meshes"""
+        num_inference_steps, guidance_scale, octree_resolution = items[0].key
+        meshes = self.run_batch(
+            [item.image for item in items],
+            [item.seed for item in items],
+            octree_resolution=octree_resolution,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            timings=[item.timings for item in items],
+        )
+        for item, mesh in zip(items, meshes):
+            item.future.set_result(mesh)
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            for item in batch:
+                wait = started - item.enqueued_at
+                self._wait_sum += wait
+                self._wait_max = max(self._wait_max, wait)
+                wait_ms = wait * 1000
+                for i, bound in enumerate(WAIT_BUCKETS_MS):
+                    if wait_ms <= bound:
+                        self._wait_buckets[i] += 1
+                        break
+                else:
+                    self._wait_buckets[-1] += 1
+
+    def stats(self):
+        """Batch-size histogram and queue wait counters"""
+        with self._stats_lock:
+            wait_hist = {f'le_{bound}ms': count for bound, count in zip(WAIT_BUCKETS_MS, self._wait_buckets)}
+            wait_hist['le_inf'] = self._wait_buckets[-1]
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self.queue_depth(),
+                'requests': self._requests,
+                'batches': self._batches,
+                'failed_batches': self._failed_batches,
+                'isolated_retries': self._isolated_retries,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'queue_wait_seconds_sum': self._wait_sum,
+                'queue_wait_seconds_max': self._wait_max,
+                'queue_wait_histogram': wait_hist,
+            }
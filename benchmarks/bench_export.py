@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Per-request mesh export latency: legacy temp-file round trip vs in-memory export
+
+Usage: python benchmarks/bench_export.py [--repeat 10] [--types glb obj ply] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import trimesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mesh_export import export_mesh
+
+
+def make_mesh(subdivisions):
+    """Synthetic sphere; each subdivision level quadruples the face count"""
+    return trimesh.creation.icosphere(subdivisions=subdivisions)
+
+
+def legacy_export(mesh, file_type):
+    """The previous save_mesh + predict_fn path: export, reload, export, read back"""
+    with tempfile.NamedTemporaryFile(suffix=f'.{file_type}', delete=False) as temp_file:
+        mesh.export(temp_file.name)
+        mesh = trimesh.load(temp_file.name)
+        output_path = f'/tmp/bench_output.{file_type}'
+        mesh.export(output_path)
+    with open(output_path, 'rb') as f:
+        data = f.read()
+    os.remove(temp_file.name)
+    return data
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--types', nargs='+', default=['glb', 'obj', 'ply'])
+    parser.add_argument('--subdivisions', nargs='+', type=int, default=[5, 6, 7])
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'type':<5} {'faces':>8} {'legacy ms':>10} {'memory ms':>10} {'speedup':>8}")
+    for subdivisions in args.subdivisions:
+        mesh = make_mesh(subdivisions)
+        for file_type in args.types:
+            legacy = time_call(lambda: legacy_export(mesh, file_type), args.repeat)
+            memory = time_call(lambda: export_mesh(mesh, file_type), args.repeat)
+            row = {
+                'type': file_type,
+                'faces': len(mesh.faces),
+                'legacy_median_ms': statistics.median(legacy) * 1000,
+                'memory_median_ms': statistics.median(memory) * 1000,
+            }
+            row['speedup'] = row['legacy_median_ms'] / row['memory_median_ms']
+            results.append(row)
+            print(f"{file_type:<5} {row['faces']:>8} {row['legacy_median_ms']:>10.1f} "
+                  f"{row['memory_median_ms']:>10.1f} {row['speedup']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+CPU micro-benchmarks for the non-model steps of ModelHandler, with regression checks
+
+Covers load_image_from_base64 (PNG / JPEG / WebP at several sizes, including
+the decode), input_fn on multi-megabyte bodies, save_mesh for 10k-500k face
+meshes in glb / obj / ply, base64 encoding of the mesh and output_fn for JSON
+and binary responses. Reports the median time and the peak traced memory
+(Python and numpy allocations) of each case. Uses the stub hy3dgen from
+benchmarks/stubs, so no GPU or model weights are needed (torch is).
+
+Usage:
+    python benchmarks/bench_handler.py --json results.json
+    python benchmarks/bench_handler.py --baseline results.json   # exit 1 on regression
+    python benchmarks/bench_handler.py --filter save_mesh --repeat 3
+"""
+import argparse
+import base64
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks', 'stubs'))
+
+# Inline post-processing and no result cache: nothing but the measured step runs
+os.environ.setdefault('POSTPROCESS_WORKERS', '0')
+os.environ.setdefault('RESULT_CACHE_MEMORY_BYTES', '0')
+
+from hy3dgen.shapegen import synthetic_mesh
+from inference import ModelHandler
+
+IMAGE_FORMATS = ('PNG', 'JPEG', 'WEBP')
+IMAGE_SIZES = (256, 512, 1024, 2048)
+BODY_MEGABYTES = (1, 4, 16)
+MESH_FACES = (10000, 50000, 100000, 500000)
+MESH_TYPES = ('glb', 'obj', 'ply')
+
+
+def make_image_b64(fmt, size):
+    """Smooth gradient plus noise, so the encoded size is close to a photo's"""
+    rng = np.random.default_rng(size)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    pixels = np.stack([np.add.outer(ramp, ramp) / 2, np.tile(ramp, (size, 1)), np.tile(ramp[:, None], (1, size))],
+                      axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 12, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_body(megabytes):
+    """A request body whose base64 image field is about the given size"""
+    payload = base64.b64encode(os.urandom(megabytes * 1024 * 1024 * 3 // 4)).decode()
+    return json.dumps({'image': payload, 'texture': False, 'seed': 42, 'octree_resolution': 256})
+
+
+def build_cases(handler, output_dir):
+    """(name, setup, fn) triples; setup builds the inputs outside the measured call"""
+    cases = []
+
+    for fmt in IMAGE_FORMATS:
+        for size in IMAGE_SIZES:
+            cases.append((
+                f'load_image_from_base64/{fmt.lower()}_{size}',
+                lambda fmt=fmt, size=size: make_image_b64(fmt, size),
+                # The serving path decodes the pixels right after, so the decode is part of the step
+                lambda image_b64: handler.load_image_from_base64(image_b64).load(),
+            ))
+
+    for megabytes in BODY_MEGABYTES:
+        cases.append((
+            f'input_fn/{megabytes}mb',
+            lambda megabytes=megabytes: make_body(megabytes),
+            lambda body: handler.input_fn(body, 'application/json'),
+        ))
+
+    for faces in MESH_FACES:
+        mesh_setup = lambda faces=faces: synthetic_mesh(0, faces)
+        for file_type in MESH_TYPES:
+            path = os.path.join(output_dir, f'mesh.{file_type}')
+            cases.append((
+                f'save_mesh/{file_type}_{faces // 1000}k',
+                mesh_setup,
+                lambda mesh, path=path, file_type=file_type: handler.save_mesh(mesh, path, file_type),
+            ))
+
+        glb_setup = lambda faces=faces: handler.export_mesh(synthetic_mesh(0, faces), 'glb')
+        cases.append((
+            f'base64/{faces // 1000}k',
+            glb_setup,
+            lambda data: base64.b64encode(data).decode(),
+        ))
+        cases.append((
+            f'output_fn/json_{faces // 1000}k',
+            glb_setup,
+            lambda data: handler.output_fn({'status': 'completed', 'type': 'glb', 'model_bytes': data},
+                                           'application/json'),
+        ))
+        cases.append((
+            f'output_fn/binary_{faces // 1000}k',
+            glb_setup,
+            lambda data: handler.output_fn({'status': 'completed', 'type': 'glb', 'model_bytes': data},
+                                           'model/gltf-binary'),
+        ))
+    return cases
+
+
+def measure(setup, fn, repeat):
+    """Median and min seconds over repeat calls (after one warm-up), then peak traced memory of one call"""
+    value = setup()
+    fn(value)
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - start)
+
+    # Separate pass: tracing slows the call down, so it must not affect the timings
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': statistics.median(samples) * 1000,
+        'min_ms': min(samples) * 1000,
+        'peak_mb': peak / 1024 ** 2,
+    }
+
+
+def compare(results, baseline, tolerance, memory_tolerance, min_delta_ms):
+    """Cases slower (or using more memory) than the baseline beyond the tolerances"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if (current['median_ms'] > previous['median_ms'] * (1 + tolerance)
+                and current['median_ms'] - previous['median_ms'] > min_delta_ms):
+            regressions.append((name, 'median_ms', previous['median_ms'], current['median_ms']))
+        if (current['peak_mb'] > previous['peak_mb'] * (1 + memory_tolerance)
+                and current['peak_mb'] - previous['peak_mb'] > 1):
+            regressions.append((name, 'peak_mb', previous['peak_mb'], current['peak_mb']))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', help='only run cases whose name contains this')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier commit to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed relative peak memory growth')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    # save_mesh logs every call
+    logging.disable(logging.INFO)
+    handler = ModelHandler()
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        print(f"{'case':<36} {'median ms':>10} {'min ms':>10} {'peak MB':>9}")
+        for name, setup, fn in build_cases(handler, output_dir):
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = row = measure(setup, fn, args.repeat)
+            print(f"{name:<36} {row['median_ms']:>10.2f} {row['min_ms']:>10.2f} {row['peak_mb']:>9.1f}")
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.tolerance, args.memory_tolerance,
+                              args.min_delta_ms)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('commit')})")
+        for name, metric, previous, current in regressions:
+            print(f"REGRESSION {name} {metric}: {previous:.2f} -> {current:.2f}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
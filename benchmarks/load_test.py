@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Serving-layer load test: serve with fake pipelines, open- or closed-loop traffic, JSON baselines
+
+The fake hy3dgen in benchmarks/stubs replaces the models (see its docstring
+for the FAKE_* cost settings), so this measures what serve, predict_fn,
+export and response encoding add on top of the model time, and how requests
+queue under load. Requires the serving dependencies except hy3dgen and a GPU
+(a CPU build of torch is enough).
+
+Usage:
+    python benchmarks/load_test.py --mode closed --concurrency 8 --duration 60
+    python benchmarks/load_test.py --mode open --rps 4 --duration 60 --name open4 --save-baseline baseline.json
+    python benchmarks/load_test.py --mode open --rps 4 --duration 60 --name open4 --baseline baseline.json
+    python benchmarks/load_test.py --url http://localhost:8080 ...   # an already running server
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'stubs')
+sys.path.insert(0, REPO_DIR)
+from batch_client import HttpTransport
+
+# serve settings that keep every request on the measured path
+SERVER_ENV = {
+    'TEXTURE_PIPELINE_POLICY': 'lazy',
+    'TEXTURE_PREFETCH': '0',
+    'RESULT_CACHE_MEMORY_BYTES': '0',
+    'PYTHONUNBUFFERED': '1',
+}
+
+# Metrics compared against a baseline, and whether larger values are better
+BASELINE_METRICS = {
+    'throughput_rps': True,
+    'latency.p50': False,
+    'latency.p99': False,
+}
+
+
+def percentile(sorted_values, q):
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def distribution(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        'mean': statistics.mean(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': values[-1],
+    }
+
+
+def start_server(args):
+    """Run serve with the stub pipelines first on the path and wait until /ping reports ready"""
+    env = dict(os.environ, **SERVER_ENV, SERVER_MODE=args.server_mode)
+    env['PYTHONPATH'] = os.pathsep.join([args.stubs, REPO_DIR, env.get('PYTHONPATH', '')])
+    for setting in args.fake or []:
+        name, _, value = setting.partition('=')
+        env[name] = value
+    log = open(args.server_log, 'w')
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'serve')], cwd=REPO_DIR, env=env,
+                               stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve exited with {process.returncode}, see {args.server_log}")
+        try:
+            with urllib.request.urlopen(f'{args.url}/ping', timeout=2) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError(f"serve not ready after {args.startup_timeout}s, see {args.server_log}")
+
+
+def stop_server(process):
+    # gunicorn mode has an arbiter plus the inference worker: stop the whole process group
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def make_body(index, params):
+    """A distinct image and seed per request, so background removal and generation are never memoized"""
+    rng = random.Random(index)
+    img = Image.new('RGB', (512, 512), color=(255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    color = tuple(rng.randrange(256) for _ in range(3))
+    draw.rectangle([rng.randrange(100, 200), rng.randrange(100, 200), rng.randrange(300, 420),
+                    rng.randrange(300, 420)], fill=color, outline=(0, 0, 0), width=3)
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    request = dict(params, image=base64.b64encode(buffer.getvalue()).decode(), seed=index, return_timings=True)
+    return json.dumps(request).encode()
+
+
+class Recorder:
+    """Per-request outcomes, appended from the client threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+
+def send(transport, body, accept, recorder, scheduled=None):
+    """One request; latency counts from the scheduled send time so client-side queueing is not hidden"""
+    started = time.perf_counter()
+    scheduled = scheduled or started
+    record = {'client_queue': started - scheduled}
+    try:
+        response = transport.invoke(body, accept)
+        data = response.read()
+        record['status'] = response.status
+        record['bytes'] = len(data)
+        if response.content_type.startswith('application/json'):
+            result = json.loads(data)
+            record['result'] = result.get('status')
+            record['stages'] = result.get('timings', {})
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['latency'] = time.perf_counter() - scheduled
+    recorder.add(record)
+
+
+def closed_loop(transport, bodies, accept, concurrency, duration, recorder):
+    """concurrency clients, each sending its next request as soon as the previous one returns"""
+    deadline = time.perf_counter() + duration
+    counter = iter(range(sys.maxsize))
+    lock = threading.Lock()
+
+    def client():
+        while time.perf_counter() < deadline:
+            with lock:
+                index = next(counter)
+            send(transport, bodies(index), accept, recorder)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(transport, bodies, accept, rps, duration, recorder, max_in_flight=256, poisson=True):
+    """Requests arrive at rps regardless of how fast they complete (Poisson arrivals by default)"""
+    start = time.perf_counter()
+    rng = random.Random(0)
+    scheduled = start
+    index = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while scheduled - start < duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, transport, bodies(index), accept, recorder, scheduled)
+            index += 1
+            scheduled += rng.expovariate(rps) if poisson else 1.0 / rps
+
+
+def summarize(records, elapsed, config):
+    ok = [r for r in records if r.get('status') == 200 and r.get('result', 'completed') == 'completed']
+    status_counts = {}
+    for record in records:
+        key = str(record.get('status'))
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    stage_values = {}
+    for record in ok:
+        for name, seconds in record.get('stages', {}).items():
+            stage_values.setdefault(name, []).append(seconds)
+
+    return {
+        'config': config,
+        'requests': len(records),
+        'completed': len(ok),
+        'status_counts': status_counts,
+        'elapsed_seconds': elapsed,
+        'offered_rps': len(records) / elapsed if elapsed else 0.0,
+        'throughput_rps': len(ok) / elapsed if elapsed else 0.0,
+        'latency': distribution([r['latency'] for r in ok]),
+        'client_queue': distribution([r['client_queue'] for r in records]),
+        # Server-side breakdown; admission_wait and batch_wait are the queueing
+        'stages': {name: distribution(values) for name, values in sorted(stage_values.items())},
+    }
+
+
+def _lookup(result, path):
+    for key in path.split('.'):
+        result = (result or {}).get(key)
+    return result
+
+
+def compare(result, baseline, tolerance, min_delta):
+    """Regressions beyond tolerance (relative) and min_delta (seconds, for latencies) against a baseline"""
+    metrics = dict(BASELINE_METRICS)
+    for name in baseline.get('stages', {}):
+        metrics[f'stages.{name}.p50'] = False
+    regressions = []
+    for path, higher_is_better in metrics.items():
+        old, new = _lookup(baseline, path), _lookup(result, path)
+        if old is None or new is None:
+            continue
+        if higher_is_better:
+            regressed = new < old * (1 - tolerance)
+        else:
+            regressed = new > old * (1 + tolerance) and new - old > min_delta
+        if regressed:
+            regressions.append({'metric': path, 'baseline': old, 'current': new})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=['open', 'closed'], default='closed')
+    parser.add_argument('--rps', type=float, default=2.0, help='open loop: target arrival rate')
+    parser.add_argument('--uniform', action='store_true', help='open loop: fixed spacing instead of Poisson')
+    parser.add_argument('--concurrency', type=int, default=4, help='closed loop: concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of traffic')
+    parser.add_argument('--warmup', type=int, default=2, help='requests sent (and discarded) first')
+    parser.add_argument('--params', default='{}', help='JSON request parameters, e.g. \'{"texture": true}\'')
+    parser.add_argument('--binary', action='store_true', help='Accept model/gltf-binary (no stage breakdown)')
+    parser.add_argument('--url', help='test a running server instead of starting serve with the stubs')
+    parser.add_argument('--server-mode', choices=['gunicorn', 'flask'], default='gunicorn')
+    parser.add_argument('--stubs', default=STUBS_DIR, help='directory holding a fake hy3dgen package')
+    parser.add_argument('--fake', action='append', metavar='NAME=VALUE',
+                        help='stub setting, e.g. FAKE_SHAPE_SECONDS=0.5 (repeatable)')
+    parser.add_argument('--server-log', default='load_test_server.log')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--name', default='default', help='scenario name in the baseline file')
+    parser.add_argument('--json', help='write the result to this file')
+    parser.add_argument('--baseline', help='compare against this baseline file, exit 1 on regression')
+    parser.add_argument('--save-baseline', help='store the result in this baseline file under --name')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore latency changes smaller than this')
+    args = parser.parse_args()
+
+    params = json.loads(args.params)
+    accept = 'model/gltf-binary' if args.binary else 'application/json'
+    process = None
+    if not args.url:
+        args.url = 'http://localhost:8080'
+        process = start_server(args)
+    try:
+        transport = HttpTransport(args.url)
+        recorder = Recorder()
+        for index in range(args.warmup):
+            send(transport, make_body(10 ** 9 + index, params), accept, recorder)
+
+        recorder = Recorder()
+        bodies = lambda index: make_body(index, params)
+        start = time.perf_counter()
+        if args.mode == 'closed':
+            closed_loop(transport, bodies, accept, args.concurrency, args.duration, recorder)
+        else:
+            open_loop(transport, bodies, accept, args.rps, args.duration, recorder, poisson=not args.uniform)
+        elapsed = time.perf_counter() - start
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    config = {
+        'mode': args.mode,
+        'rps': args.rps if args.mode == 'open' else None,
+        'concurrency': args.concurrency if args.mode == 'closed' else None,
+        'duration': args.duration,
+        'params': params,
+        'accept': accept,
+        'server_mode': args.server_mode if process is not None else None,
+        'fake': args.fake or [],
+    }
+    result = summarize(recorder.records, elapsed, config)
+    print(json.dumps({key: result[key] for key in ('requests', 'completed', 'status_counts', 'offered_rps',
+                                                   'throughput_rps', 'latency', 'client_queue')}, indent=2))
+    for name, values in result['stages'].items():
+        print(f"{name:<28} p50 {values['p50'] * 1000:9.1f} ms   p99 {values['p99'] * 1000:9.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get(args.name)
+        if baseline is None:
+            print(f"No baseline for scenario {args.name} in {args.baseline}")
+        else:
+            regressions = compare(result, baseline, args.tolerance, args.min_delta_ms / 1000)
+            for regression in regressions:
+                print(f"REGRESSION {regression['metric']}: {regression['baseline']:.4f} -> {regression['current']:.4f}")
+            status = 1 if regressions else 0
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                baselines = json.load(f)
+        baselines[args.name] = result
+        with open(args.save_baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
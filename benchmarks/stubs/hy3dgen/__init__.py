@@ -0,0 +1,29 @@
+"""
+Stand-in for the hy3dgen package: same entry points, no GPU, configurable cost
+
+Put benchmarks/stubs first on PYTHONPATH (benchmarks/load_test.py does) and
+serve runs unmodified against these fakes. Costs and sizes come from the
+environment:
+
+    FAKE_LOAD_SECONDS          model deserialization time                    (0)
+    FAKE_REMBG_SECONDS         background removal per image                  (0.05)
+    FAKE_SHAPE_SECONDS         DiT sampling per batched call                 (1.0)
+    FAKE_SHAPE_ITEM_SECONDS    extra sampling time per image in a batch      (0.1)
+    FAKE_DECODE_SECONDS        volume decoding per image at octree 256       (0.2, scales with resolution^3)
+    FAKE_MESH_FACES            faces of a mesh decoded at octree 256         (40000, scales with resolution^2)
+    FAKE_POSTPROCESS_SECONDS   per post-processing step                      (0.02)
+    FAKE_TEXTURE_SECONDS       texture painting per mesh                     (5.0)
+    FAKE_TEXTURE_SIZE          edge length of the painted texture image      (1024)
+"""
+import os
+import time
+
+
+def setting(name, default):
+    return float(os.environ.get(name, default))
+
+
+def sleep(name, default, scale=1.0):
+    seconds = setting(name, default) * scale
+    if seconds > 0:
+        time.sleep(seconds)
@@ -0,0 +1,9 @@
+from . import sleep
+
+
+class BackgroundRemover:
+    """Returns the image as RGBA after FAKE_REMBG_SECONDS"""
+
+    def __call__(self, image):
+        sleep('FAKE_REMBG_SECONDS', 0.05)
+        return image.convert('RGBA')
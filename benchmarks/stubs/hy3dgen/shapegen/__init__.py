@@ -0,0 +1,86 @@
+"""
+Fake shape pipeline: sleeps instead of sampling and decodes synthetic spheres
+
+Latents are just the per-image seeds, so decoding the same latents twice
+(preview, then full resolution) gives the same shape, and a seed always
+produces the same mesh.
+"""
+import functools
+
+import numpy as np
+import trimesh
+
+from .. import setting, sleep
+
+REFERENCE_RESOLUTION = 256
+
+
+@functools.lru_cache(maxsize=8)
+def _sphere(faces):
+    # uv_sphere(count=[n, n]) has about 2 * n * n faces
+    n = max(3, int(round((faces / 2) ** 0.5)))
+    return trimesh.creation.uv_sphere(count=[n, n])
+
+
+def synthetic_mesh(seed, faces):
+    """Sphere with about the given face count, stretched per seed"""
+    sphere = _sphere(int(faces))
+    scale = 1.0 + 0.5 * np.random.default_rng(seed % 2 ** 32).random(3)
+    return trimesh.Trimesh(vertices=sphere.vertices * scale, faces=sphere.faces.copy(), process=False)
+
+
+class Hunyuan3DDiTFlowMatchingPipeline:
+
+    @classmethod
+    def from_single_file(cls, ckpt_path, config_path, **kwargs):
+        sleep('FAKE_LOAD_SECONDS', 0)
+        return cls()
+
+    @classmethod
+    def from_pretrained(cls, model_path, **kwargs):
+        sleep('FAKE_LOAD_SECONDS', 0)
+        return cls()
+
+    def to(self, device=None, dtype=None):
+        return self
+
+    def enable_flashvdm(self, **kwargs):
+        pass
+
+    def __call__(self, image=None, generator=None, output_type='trimesh', octree_resolution=256, **kwargs):
+        images = image if isinstance(image, list) else [image]
+        generators = generator if isinstance(generator, list) else [generator] * len(images)
+        sleep('FAKE_SHAPE_SECONDS', 1.0)
+        sleep('FAKE_SHAPE_ITEM_SECONDS', 0.1, scale=len(images))
+        latents = [g.initial_seed() if g is not None else 0 for g in generators]
+        if output_type == 'latent':
+            return latents
+        return self._export(latents, octree_resolution=octree_resolution)
+
+    def _export(self, latents, output_type='trimesh', octree_resolution=256, **kwargs):
+        ratio = octree_resolution / REFERENCE_RESOLUTION
+        sleep('FAKE_DECODE_SECONDS', 0.2, scale=len(latents) * ratio ** 3)
+        faces = max(100, setting('FAKE_MESH_FACES', 40000) * ratio ** 2)
+        return [synthetic_mesh(seed, faces) for seed in latents]
+
+
+class FloaterRemover:
+    def __call__(self, mesh):
+        sleep('FAKE_POSTPROCESS_SECONDS', 0.02)
+        return mesh
+
+
+class DegenerateFaceRemover:
+    def __call__(self, mesh):
+        sleep('FAKE_POSTPROCESS_SECONDS', 0.02)
+        return mesh
+
+
+class FaceReducer:
+    def __call__(self, mesh, max_facenum=40000):
+        sleep('FAKE_POSTPROCESS_SECONDS', 0.02)
+        if len(mesh.faces) <= max_facenum:
+            return mesh
+        mesh = trimesh.Trimesh(vertices=mesh.vertices, faces=mesh.faces[:max_facenum], process=False)
+        mesh.remove_unreferenced_vertices()
+        return mesh
@@ -0,0 +1,3 @@
+def smart_load_model(model_path, subfolder='', use_safetensors=True, variant=None, **kwargs):
+    """Nothing to download; returns placeholder config and checkpoint paths"""
+    return f'{model_path}/{subfolder}/config.yaml', f'{model_path}/{subfolder}/model.safetensors'
@@ -0,0 +1,38 @@
+"""
+Fake paint pipeline: sleeps, then attaches a UV map and a generated texture image
+"""
+import numpy as np
+import trimesh
+from PIL import Image
+
+from . import setting, sleep
+
+
+class _Model:
+    class _Pipeline:
+        def to(self, device):
+            return self
+
+    def __init__(self):
+        self.pipeline = self._Pipeline()
+
+
+class Hunyuan3DPaintPipeline:
+
+    def __init__(self):
+        self.models = {'delight_model': _Model(), 'multiview_model': _Model()}
+
+    @classmethod
+    def from_pretrained(cls, model_path, **kwargs):
+        sleep('FAKE_LOAD_SECONDS', 0)
+        return cls()
+
+    def __call__(self, mesh, image=None):
+        sleep('FAKE_TEXTURE_SECONDS', 5.0)
+        size = int(setting('FAKE_TEXTURE_SIZE', 1024))
+        # Noise does not compress, so the exported texture is as large as a real one
+        pixels = np.random.default_rng(len(mesh.faces)).integers(0, 256, (size, size, 3), dtype=np.uint8)
+        uv = (mesh.vertices[:, :2] - mesh.vertices[:, :2].min(axis=0)) / np.ptp(mesh.vertices[:, :2], axis=0)
+        textured = mesh.copy()
+        textured.visual = trimesh.visual.TextureVisuals(uv=uv, image=Image.fromarray(pixels))
+        return textured
@@ -13,6 +13,10 @@ import os
 import tempfile
 import base64
 
+# 设置为S3路径（如 s3://bucket/async-output/）时以SageMaker异步推理方式部署，并支持缩容到0
+ASYNC_OUTPUT_PATH = os.environ.get('ASYNC_OUTPUT_PATH')
+ASYNC_MAX_INSTANCES = int(os.environ.get('ASYNC_MAX_INSTANCES', '2'))
+
 def format_duration(seconds):
     """格式化时间显示"""
     if seconds < 60:
@@ -40,6 +44,22 @@ def create_source_bundle():
             'Dockerfile',
             'serve',
             'inference.py',
+            'admission.py',
+            'memory_budget.py',
+            'batching.py',
+            'jobs.py',
+            's3_io.py',
+            'result_cache.py',
+            'coalescing.py',
+            'stages.py',
+            'mesh_export.py',
+            'mesh_compression.py',
+            'metrics.py',
+            'model_loading.py',
+            'preprocess.py',
+            'postprocess.py',
+            'ipc.py',
+            'inference_worker.py',
             'buildspec.yml'
         ]
         
@@ -327,9 +347,9 @@ def deploy_model(image_uri):
     config_name = f'hunyuan3d-config-{int(time.time())}'
     sagemaker_client = boto3.client('sagemaker')
     
-    sagemaker_client.create_endpoint_config(
-        EndpointConfigName=config_name,
-        ProductionVariants=[
+    endpoint_config = {
+        'EndpointConfigName': config_name,
+        'ProductionVariants': [
             {
                 'VariantName': 'AllTraffic',
                 'ModelName': model_name,
@@ -340,7 +360,16 @@ def deploy_model(image_uri):
                 'ContainerStartupHealthCheckTimeoutInSeconds': 600
             }
         ]
-    )
+    }
+    if ASYNC_OUTPUT_PATH:
+        # 异步推理：请求体从S3读取，结果写入S3，不受同步调用超时限制
+        print(f"📬 使用异步推理，输出路径: {ASYNC_OUTPUT_PATH}")
+        endpoint_config['AsyncInferenceConfig'] = {
+            'OutputConfig': {'S3OutputPath': ASYNC_OUTPUT_PATH},
+            'ClientConfig': {'MaxConcurrentInvocationsPerInstance': 1}
+        }
+    
+    sagemaker_client.create_endpoint_config(**endpoint_config)
     config_create_duration = time.time() - config_create_start
     print(f"✅ 端点配置已创建: {config_name}，耗时: {format_duration(config_create_duration)}")
     
@@ -523,6 +552,131 @@ def deploy_model(image_uri):
             'total_deploy': total_deploy_duration
         }
 
+def configure_async_autoscaling(endpoint_name):
+    """为异步端点配置自动扩缩容（空闲时缩容到0，有积压时从0扩容）"""
+    print("📈 配置异步端点自动扩缩容...")
+    autoscaling = boto3.client('application-autoscaling')
+    cloudwatch = boto3.client('cloudwatch')
+    resource_id = f'endpoint/{endpoint_name}/variant/AllTraffic'
+    dimension = 'sagemaker:variant:DesiredInstanceCount'
+    
+    try:
+        autoscaling.register_scalable_target(
+            ServiceNamespace='sagemaker',
+            ResourceId=resource_id,
+            ScalableDimension=dimension,
+            MinCapacity=0,
+            MaxCapacity=ASYNC_MAX_INSTANCES
+        )
+        
+        # 按每实例积压请求数扩缩容
+        autoscaling.put_scaling_policy(
+            PolicyName='hunyuan3d-backlog-scaling',
+            ServiceNamespace='sagemaker',
+            ResourceId=resource_id,
+            ScalableDimension=dimension,
+            PolicyType='TargetTrackingScaling',
+            TargetTrackingScalingPolicyConfiguration={
+                'TargetValue': 2.0,
+                'CustomizedMetricSpecification': {
+                    'MetricName': 'ApproximateBacklogSizePerInstance',
+                    'Namespace': 'AWS/SageMaker',
+                    'Dimensions': [{'Name': 'EndpointName', 'Value': endpoint_name}],
+                    'Statistic': 'Average'
+                },
+                'ScaleInCooldown': 600,
+                'ScaleOutCooldown': 300
+            }
+        )
+        
+        # 实例数为0时，目标跟踪无法触发扩容，需要基于HasBacklogWithoutCapacity的步进策略
+        step_policy = autoscaling.put_scaling_policy(
+            PolicyName='hunyuan3d-scale-from-zero',
+            ServiceNamespace='sagemaker',
+            ResourceId=resource_id,
+            ScalableDimension=dimension,
+            PolicyType='StepScaling',
+            StepScalingPolicyConfiguration={
+                'AdjustmentType': 'ChangeInCapacity',
+                'MetricAggregationType': 'Average',
+                'Cooldown': 300,
+                'StepAdjustments': [{'MetricIntervalLowerBound': 0, 'ScalingAdjustment': 1}]
+            }
+        )
+        cloudwatch.put_metric_alarm(
+            AlarmName=f'{endpoint_name}-has-backlog-without-capacity',
+            MetricName='HasBacklogWithoutCapacity',
+            Namespace='AWS/SageMaker',
+            Statistic='Average',
+            Dimensions=[{'Name': 'EndpointName', 'Value': endpoint_name}],
+            Period=60,
+            EvaluationPeriods=2,
+            DatapointsToAlarm=2,
+            Threshold=1,
+            ComparisonOperator='GreaterThanOrEqualToThreshold',
+            TreatMissingData='missing',
+            AlarmActions=[step_policy['PolicyARN']]
+        )
+        print(f"✅ 自动扩缩容已配置: 0-{ASYNC_MAX_INSTANCES} 个实例")
+        return True
+    except Exception as e:
+        print(f"❌ 配置自动扩缩容失败: {e}")
+        return False
+
+def test_async_endpoint(endpoint_name):
+    """通过异步推理测试端点：上传请求到S3，轮询输出位置"""
+    print("🧪 测试异步端点...")
+    test_start_time = time.time()
+    
+    try:
+        s3_client = boto3.client('s3')
+        runtime = boto3.client('sagemaker-runtime', region_name='us-east-1')
+        
+        bucket = ASYNC_OUTPUT_PATH.split('/')[2]
+        input_key = f"async-input/test-{int(time.time())}.json"
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=input_key,
+            Body=json.dumps({
+                "image": base64.b64encode(create_test_image()).decode(),
+                "texture": False,
+                "num_inference_steps": 2
+            }).encode()
+        )
+        
+        response = runtime.invoke_endpoint_async(
+            EndpointName=endpoint_name,
+            InputLocation=f"s3://{bucket}/{input_key}",
+            ContentType='application/json'
+        )
+        output_location = response['OutputLocation']
+        print(f"✅ 异步请求已提交，输出位置: {output_location}")
+        
+        output_bucket, output_key = output_location[len('s3://'):].split('/', 1)
+        for _ in range(120):
+            try:
+                body = s3_client.get_object(Bucket=output_bucket, Key=output_key)['Body'].read()
+            except s3_client.exceptions.NoSuchKey:
+                time.sleep(10)
+                continue
+            
+            result = json.loads(body.decode())
+            test_duration = time.time() - test_start_time
+            if result.get('status') == 'completed':
+                print(f"✅ 异步端点测试成功！耗时: {format_duration(test_duration)}")
+                return True, test_duration, 0
+            print(f"❌ 异步推理失败: {result.get('error', result)}")
+            return False, test_duration, 0
+        
+        test_duration = time.time() - test_start_time
+        print("❌ 等待异步结果超时")
+        return False, test_duration, 0
+        
+    except Exception as e:
+        test_duration = time.time() - test_start_time
+        print(f"❌ 异步端点测试失败: {e}")
+        return False, test_duration, 0
+
 def create_test_image():
     """创建合理的测试图像"""
     from PIL import Image
@@ -655,7 +809,11 @@ def main():
     
     # 5. 测试端点
     endpoint_name = 'hunyuan3d-custom-endpoint'
-    test_success, test_duration, model_loading_duration = test_endpoint(endpoint_name)
+    if ASYNC_OUTPUT_PATH:
+        configure_async_autoscaling(endpoint_name)
+        test_success, test_duration, model_loading_duration = test_async_endpoint(endpoint_name)
+    else:
+        test_success, test_duration, model_loading_duration = test_endpoint(endpoint_name)
     
     # 6. 输出结果和时间统计
     total_duration = time.time() - total_start_time
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical in-flight requests
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Lets only the first of several concurrent calls with the same key do the work.
+
+    join() makes the first caller for a key the leader; callers arriving while
+    the leader is still running get the leader's future and wait on it. The
+    leader publishes its outcome with finish(), which also forgets the key, so
+    a failure reaches the current waiters but is never handed to later calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {
+            'leaders': 0,
+            'coalesced': 0,
+            'shared_failures': 0,
+        }
+
+    def join(self, key):
+        """Return (future, leader); leader is True when the caller must compute and finish() the key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._stats['coalesced'] += 1
+                return flight, False
+            flight = self._flights[key] = Future()
+            flight.waiters = 0
+            self._stats['leaders'] += 1
+            return flight, True
+
+    def finish(self, key, result=None, error=None):
+        """Hand the leader's result (or error) to the waiters and forget the key"""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if flight is None:
+                return
+            if error is not None:
+                self._stats['shared_failures'] += flight.waiters
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                in_flight=len(self._flights),
+                waiting=sum(flight.waiters for flight in self._flights.values()),
+            )
@@ -5,6 +5,10 @@ import base64
 from PIL import Image, ImageDraw
 from io import BytesIO
 
+# 以二进制GLB接收结果（Accept: model/gltf-binary），避免base64/JSON带来的约33%体积膨胀
+# 设为False则使用兼容的JSON/base64响应
+USE_BINARY_RESPONSE = True
+
 def create_colorful_robot():
     """创建一个彩色的机器人图片"""
     img = Image.new('RGB', (512, 512), color=(240, 240, 240))  # 浅灰背景
@@ -61,9 +65,24 @@ def generate_textured_model():
         response = runtime.invoke_endpoint(
             EndpointName=endpoint_name,
             ContentType='application/json',
+            Accept='model/gltf-binary' if USE_BINARY_RESPONSE else 'application/json',
             Body=json.dumps(test_payload)
         )
         
+        if response['ContentType'] != 'application/json':
+            # 二进制响应：分块读取网格字节并写入文件，元数据在CustomAttributes中
+            output_file = 'textured_robot.glb'
+            model_size = 0
+            with open(output_file, 'wb') as f:
+                for chunk in response['Body'].iter_chunks(chunk_size=1024 * 1024):
+                    f.write(chunk)
+                    model_size += len(chunk)
+            
+            print(f"✅ 带纹理的3D机器人已保存到: {output_file}")
+            print(f"📦 文件大小: {model_size} 字节")
+            print(f"ℹ️ 响应元数据: {response.get('CustomAttributes', '')}")
+            return
+        
         result = json.loads(response['Body'].read().decode())
         
         if result.get('status') == 'completed' and 'model_base64' in result:
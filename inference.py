@@ -5,23 +5,127 @@ SageMaker inference script based on official Hunyuan3D-2 api_server.py
 import json
 import logging
 import os
-import tempfile
 import time
 import base64
-from io import BytesIO
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 
+import huggingface_hub
 import torch
-import trimesh
-from PIL import Image
+from PIL import Image, ImageDraw
 
 from hy3dgen.rembg import BackgroundRemover
-from hy3dgen.shapegen import Hunyuan3DDiTFlowMatchingPipeline, FloaterRemover, DegenerateFaceRemover, FaceReducer
+from hy3dgen.shapegen import Hunyuan3DDiTFlowMatchingPipeline
+from hy3dgen.shapegen.utils import smart_load_model
 from hy3dgen.texgen import Hunyuan3DPaintPipeline
 
+from admission import AdmissionController, AdmissionRejected
+from batching import ShapeBatcher
+from coalescing import SingleFlight
+from mesh_export import (
+    BINARY_CONTENT_TYPES, PART_KEYS, encode_model_bytes, export_lod_scene, export_mesh, mesh_content_type, pack_parts,
+    part_suffix, unpack_parts,
+)
+from memory_budget import MemoryModel, PeakTracker
+from mesh_compression import GEOMETRY_STEPS, compress_mesh, content_encoding, parse_compression
+from metrics import REQUESTS, RequestTimings
+from model_loading import ManagedPipeline, StartupReport
+from postprocess import MeshPostprocessor
+import s3_io
+from preprocess import IMAGE_MAX_SIDE, BackgroundPreprocessor, open_image
+from result_cache import ResultCache, cache_key
+from stages import Stage
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model weights
+SHAPE_MODEL_PATH = 'tencent/Hunyuan3D-2mini'
+SHAPE_SUBFOLDER = 'hunyuan3d-dit-v2-mini-turbo'
+SHAPE_VAE_SUBFOLDER = 'hunyuan3d-vae-v2-mini-turbo'
+TEXTURE_MODEL_PATH = 'tencent/Hunyuan3D-2'
+# Passed to from_pretrained as well, so the prefetch downloads exactly what the pipeline loads
+TEXTURE_PAINT_SUBFOLDER = 'hunyuan3d-paint-v2-0'
+TEXTURE_SUBFOLDERS = ('hunyuan3d-delight-v2-0', TEXTURE_PAINT_SUBFOLDER)
+
+# Micro-batching window for shape generation (SHAPE_BATCH_MAX_SIZE=0 disables batching)
+SHAPE_BATCH_MAX_SIZE = int(os.environ.get('SHAPE_BATCH_MAX_SIZE', '4'))
+SHAPE_BATCH_MAX_WAIT_MS = float(os.environ.get('SHAPE_BATCH_MAX_WAIT_MS', '10'))
+
+# Per-stage worker limits; the shape stage needs enough workers to fill a micro-batch
+SHAPE_STAGE_CONCURRENCY = int(os.environ.get('SHAPE_STAGE_CONCURRENCY', str(max(1, SHAPE_BATCH_MAX_SIZE))))
+TEXTURE_STAGE_CONCURRENCY = int(os.environ.get('TEXTURE_STAGE_CONCURRENCY', '1'))
+
+# GPU admission control; by default enough concurrent jobs to keep both stages busy
+ADMISSION_MAX_CONCURRENT = int(os.environ.get(
+    'ADMISSION_MAX_CONCURRENT', str(SHAPE_STAGE_CONCURRENCY + TEXTURE_STAGE_CONCURRENCY)))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', '16'))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', '30'))
+
+# Memory-aware admission: jobs run together only while their estimated peaks fit the budget.
+# The budget defaults to GPU_MEMORY_BUDGET_FRACTION of device memory minus what the loaded models hold.
+GPU_MEMORY_SCHEDULING = os.environ.get('GPU_MEMORY_SCHEDULING', '1') == '1'
+GPU_MEMORY_BUDGET_BYTES = int(os.environ.get('GPU_MEMORY_BUDGET_BYTES', '0'))
+GPU_MEMORY_BUDGET_FRACTION = float(os.environ.get('GPU_MEMORY_BUDGET_FRACTION', '0.9'))
+# Cached allocator blocks are only returned to the device once reserved memory exceeds this fraction
+GPU_MEMORY_RELEASE_FRACTION = float(os.environ.get('GPU_MEMORY_RELEASE_FRACTION', '0.85'))
+
+# Background removal memo size and CPU worker threads
+REMBG_CACHE_SIZE = int(os.environ.get('REMBG_CACHE_SIZE', '64'))
+REMBG_WORKERS = int(os.environ.get('REMBG_WORKERS', '2'))
+
+# Octree resolution of the coarse mesh published first in preview mode
+PREVIEW_OCTREE_RESOLUTION = int(os.environ.get('PREVIEW_OCTREE_RESOLUTION', '64'))
+
+# Largest image accepted through image_uri
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(50 * 1024 ** 2)))
+# Directory local image_uri paths are resolved in (unset: only s3:// URIs are accepted)
+IMAGE_LOCAL_ROOT = os.environ.get('IMAGE_LOCAL_ROOT') or None
+
+# Meshes uploaded to output_uri at the same time (each one as a concurrent multipart upload)
+OUTPUT_UPLOAD_WORKERS = int(os.environ.get('OUTPUT_UPLOAD_WORKERS', '4'))
+
+# Upper bound on the seed-sweep batch of a single request (seeds: [...])
+MAX_SEEDS_PER_REQUEST = int(os.environ.get('MAX_SEEDS_PER_REQUEST', '8'))
+
+# Processes running mesh post-processing (0 runs it inline on the request thread)
+POSTPROCESS_WORKERS = int(os.environ.get('POSTPROCESS_WORKERS', '2'))
+
+# Texture pipeline loading policy: eager, lazy (on first use) or offload (lazy + moved to host when idle)
+TEXTURE_PIPELINE_POLICY = os.environ.get('TEXTURE_PIPELINE_POLICY', 'offload')
+TEXTURE_PIPELINE_IDLE_SECONDS = float(os.environ.get('TEXTURE_PIPELINE_IDLE_SECONDS', '600'))
+# Download texture weights during startup even when the pipeline itself loads lazily
+TEXTURE_PREFETCH = os.environ.get('TEXTURE_PREFETCH', '1') == '1'
+
+# Warmup after loading: comma-separated octree_resolution:num_inference_steps combos
+WARMUP_SHAPES = [
+    tuple(int(value) for value in item.split(':'))
+    for item in os.environ.get('WARMUP_SHAPES', '128:5').split(',') if item.strip()
+]
+WARMUP_TEXTURE = os.environ.get('WARMUP_TEXTURE', '0') == '1'
+
+# Result cache budgets (RESULT_CACHE_MEMORY_BYTES=0 and no RESULT_CACHE_DIR disables caching)
+RESULT_CACHE_MEMORY_BYTES = int(os.environ.get('RESULT_CACHE_MEMORY_BYTES', str(256 * 1024 ** 2)))
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR') or None
+RESULT_CACHE_DISK_BYTES = int(os.environ.get('RESULT_CACHE_DISK_BYTES', str(5 * 1024 ** 3)))
+
+# Concurrent requests with identical image + parameters share one generation
+COALESCE_REQUESTS = os.environ.get('COALESCE_REQUESTS', '1') == '1'
+
+class InvalidRequest(ValueError):
+    """Raised for request parameters that can never succeed; answered with 400"""
+
+
+def _int_list(value, name):
+    """A JSON list of integers; anything else (a string would be read digit by digit) is rejected"""
+    if not isinstance(value, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        raise ValueError(f"{name} must be a list of integers, got {value!r}")
+    return value
+
+
 class ModelHandler:
     def __init__(self):
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
@@ -29,95 +133,595 @@ class ModelHandler:
         
         # Initialize models
         self.rembg = None
+        self.background = None
         self.pipeline = None
-        self.pipeline_tex = None
+        self.shape_batcher = None
+        # True once the pipelines needed for shape-only traffic are ready
         self.model_loaded = False
+        # True once warmup has finished as well; gates /ping
+        self.ready = False
+        self.startup_report = StartupReport()
+        # Weight loads may run in parallel, but only one at a time moves weights onto the GPU
+        self._device_lock = threading.Lock()
+        
+        self.texture_pipeline = ManagedPipeline(
+            'texture',
+            self._load_texture_pipeline,
+            policy=TEXTURE_PIPELINE_POLICY,
+            idle_seconds=TEXTURE_PIPELINE_IDLE_SECONDS,
+            to_device=lambda pipeline: self._move_texture_pipeline(pipeline, self.device),
+            to_host=lambda pipeline: self._move_texture_pipeline(pipeline, 'cpu'),
+            on_change=lambda pipeline: self._update_memory_budget(),
+        )
+        
+        # Shape and texture run on separate stage workers so that one request's
+        # shape generation overlaps another request's texturing
+        self.shape_stage = Stage('shape', self.generate_shape, concurrency=SHAPE_STAGE_CONCURRENCY)
+        self.texture_stage = Stage('texture', self.generate_texture, concurrency=TEXTURE_STAGE_CONCURRENCY)
+        self.admission = AdmissionController(
+            max_concurrent=ADMISSION_MAX_CONCURRENT,
+            max_queue=ADMISSION_MAX_QUEUE,
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        )
+        self.postprocessor = MeshPostprocessor(workers=POSTPROCESS_WORKERS)
+        self.memory_model = MemoryModel()
+        self.peak_tracker = None
+        if self.device == 'cuda':
+            self.peak_tracker = PeakTracker(
+                torch.cuda.memory_allocated,
+                torch.cuda.max_memory_allocated,
+                torch.cuda.reset_peak_memory_stats,
+            )
+        self._memory_releases = 0
+        self._out_of_memory = 0
+        # Budget before subtracting the texture weights; None until the models are loaded and warmed up
+        self._memory_budget_base = None
+        self._texture_weight_bytes = None
+        self.upload_executor = ThreadPoolExecutor(max_workers=max(1, OUTPUT_UPLOAD_WORKERS), thread_name_prefix='upload')
+        
+        self.result_cache = None
+        if RESULT_CACHE_MEMORY_BYTES > 0 or RESULT_CACHE_DIR:
+            self.result_cache = ResultCache(
+                max_memory_bytes=RESULT_CACHE_MEMORY_BYTES,
+                disk_dir=RESULT_CACHE_DIR,
+                max_disk_bytes=RESULT_CACHE_DISK_BYTES,
+            )
+        self.inflight = SingleFlight() if COALESCE_REQUESTS else None
         
     def load_models(self):
-        """Load models following official api_server.py pattern"""
+        """Load models following official api_server.py pattern
+
+        Independent loads (rembg, shape weights, texture weight download) run
+        concurrently; moving weights onto the GPU is serialized. Every phase is
+        recorded in self.startup_report.
+        """
+        report = self.startup_report
+        # Not a with block: leaving it would join the texture download, which
+        # only the eager policy waits for; readiness depends on rembg and shape
+        loaders = ThreadPoolExecutor(max_workers=3, thread_name_prefix='loader')
         try:
-            logger.info("Loading background remover...")
-            self.rembg = BackgroundRemover()
+            rembg_future = loaders.submit(self._load_rembg)
+            shape_future = loaders.submit(self._load_shape_pipeline)
+            texture_download = None
+            if TEXTURE_PREFETCH or self.texture_pipeline.policy == 'eager':
+                texture_download = loaders.submit(self._download_texture_weights)
+                texture_download.add_done_callback(self._texture_download_done)
+            loaders.shutdown(wait=False)
             
-            logger.info("Loading shape generation pipeline...")
-            self.pipeline = Hunyuan3DDiTFlowMatchingPipeline.from_pretrained(
-                'tencent/Hunyuan3D-2mini',
-                subfolder='hunyuan3d-dit-v2-mini-turbo',
-                use_safetensors=True,
-                device=self.device,
-            )
-            self.pipeline.enable_flashvdm(mc_algo='mc')
+            self.rembg = rembg_future.result()
+            self.background = BackgroundPreprocessor(self.rembg, cache_size=REMBG_CACHE_SIZE, workers=REMBG_WORKERS)
+            self.pipeline = shape_future.result()
             
-            logger.info("Loading texture generation pipeline...")
-            self.pipeline_tex = Hunyuan3DPaintPipeline.from_pretrained('tencent/Hunyuan3D-2')
+            if SHAPE_BATCH_MAX_SIZE > 0:
+                self.shape_batcher = ShapeBatcher(
+                    self.generate_shape_batch,
+                    max_batch_size=SHAPE_BATCH_MAX_SIZE,
+                    max_wait_ms=SHAPE_BATCH_MAX_WAIT_MS,
+                )
             
+            # Shape-only traffic can be served from here on
             self.model_loaded = True
-            logger.info("✅ All models loaded successfully!")
+            logger.info("✅ Shape generation models loaded successfully!")
+            
+            if self.texture_pipeline.policy == 'eager':
+                texture_download.result()
+                logger.info("Loading texture generation pipeline...")
+                self.texture_pipeline.load()
+                logger.info("✅ All models loaded successfully!")
+            else:
+                logger.info(f"Texture generation pipeline will load on first use ({self.texture_pipeline.policy})")
+            
+            self.warmup()
+            self._set_memory_budget()
+            self.ready = True
+            report.finish()
+            report.log()
             
         except Exception as e:
             logger.error(f"Error loading models: {str(e)}")
             self.model_loaded = False
+            report.finish()
+            report.log()
             raise
 
+    def _texture_download_done(self, future):
+        """Surface a failed background prefetch; the lazy load retries the download on first use"""
+        if future.exception() is not None:
+            logger.error(f"Error prefetching texture weights: {str(future.exception())}")
+
+    def _warmup_image(self):
+        """Synthetic object on a plain background, so warmup exercises background removal too"""
+        img = Image.new('RGB', (512, 512), color=(255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([180, 120, 330, 380], fill=(120, 120, 160), outline=(0, 0, 0), width=3)
+        draw.ellipse([200, 60, 310, 170], fill=(200, 120, 80), outline=(0, 0, 0), width=3)
+        return img
+
+    def warmup(self):
+        """Run synthetic requests before reporting ready
+
+        Moves CUDA context init, kernel selection and allocator growth out of
+        the first real requests. Durations are recorded under the 'warmup'
+        component of the startup report; failures are logged, not fatal.
+        """
+        image = self._warmup_image()
+        mesh = None
+        for octree_resolution, num_inference_steps in WARMUP_SHAPES:
+            try:
+                with self.startup_report.phase('warmup', f'shape_r{octree_resolution}_s{num_inference_steps}'):
+                    # Warmup runs alone on the GPU, so its peak calibrates the memory model before real traffic
+                    with self._memory_window() as memory:
+                        mesh = self.generate_shape(
+                            image,
+                            octree_resolution=octree_resolution,
+                            num_inference_steps=num_inference_steps,
+                            timings=RequestTimings(record=False),
+                        )
+                    self._record_memory({'octree_resolution': octree_resolution}, memory)
+                    self.export_mesh(mesh, 'glb')
+            except Exception as e:
+                logger.warning(f"Warmup r{octree_resolution}/s{num_inference_steps} failed: {str(e)}")
+        
+        if mesh is not None:
+            try:
+                with self.startup_report.phase('warmup', 'postprocess'):
+                    mesh = self.postprocessor.process(mesh, timings=RequestTimings(record=False))
+            except Exception as e:
+                logger.warning(f"Post-processing warmup failed: {str(e)}")
+        
+        if WARMUP_TEXTURE and mesh is not None:
+            try:
+                with self.startup_report.phase('warmup', 'texture'):
+                    textured = self.generate_texture(mesh, image, timings=RequestTimings(record=False))
+                    self.export_mesh(textured, 'glb')
+            except Exception as e:
+                logger.warning(f"Texture warmup failed: {str(e)}")
+        
+        torch.cuda.empty_cache()
+        logger.info("✅ Warmup finished")
+
+    def _set_memory_budget(self):
+        """Give the admission controller the memory jobs may use on top of the resident models
+
+        The texture weights are accounted separately: _update_memory_budget()
+        takes them out of the budget whenever the texture pipeline is on the
+        device, since the lazy and offload policies load and move it at runtime.
+        """
+        if not GPU_MEMORY_SCHEDULING or self.device != 'cuda':
+            return
+        texture_resident = self._texture_resident_bytes()
+        budget = GPU_MEMORY_BUDGET_BYTES
+        if budget <= 0:
+            total = torch.cuda.get_device_properties(0).total_memory
+            budget = int(total * GPU_MEMORY_BUDGET_FRACTION) - (torch.cuda.memory_allocated() - texture_resident)
+        self._memory_budget_base = budget
+        self._update_memory_budget()
+
+    def _texture_resident_bytes(self):
+        """Bytes of texture pipeline weights currently on the device"""
+        pipeline_tex = self.texture_pipeline.pipeline
+        if pipeline_tex is None or not self.texture_pipeline.on_device:
+            return 0
+        if self._texture_weight_bytes is None:
+            self._texture_weight_bytes = sum(
+                tensor.numel() * tensor.element_size()
+                for model in pipeline_tex.models.values()
+                for component in model.pipeline.components.values()
+                if isinstance(component, torch.nn.Module)
+                for tensor in itertools.chain(component.parameters(), component.buffers())
+            )
+        return self._texture_weight_bytes
+
+    def _update_memory_budget(self):
+        """Resize the admission budget after the texture pipeline was loaded, offloaded or reloaded"""
+        if self._memory_budget_base is None:
+            return
+        budget = max(0, self._memory_budget_base - self._texture_resident_bytes())
+        self.admission.set_memory_budget(budget)
+        logger.info(f"GPU memory budget for concurrent jobs: {budget / 1024 ** 2:.0f} MB")
+
+    @contextmanager
+    def _texture_on_device(self, texture, timings):
+        """Hold the texture pipeline on the device for a textured request
+
+        Entered before the measured memory window, so loading or restoring
+        the weights does not count towards the request's peak.
+        """
+        if not texture:
+            yield
+            return
+        acquire_start = time.perf_counter()
+        with self.texture_pipeline.acquire():
+            timings.add('texture_pipeline_acquire', time.perf_counter() - acquire_start)
+            yield
+
+    def _memory_window(self):
+        """Measure the GPU memory peak of a block; yields a dict with 'peak_bytes' (None without CUDA)"""
+        if self.peak_tracker is None:
+            return nullcontext({'peak_bytes': None, 'exclusive': False})
+        return self.peak_tracker.window()
+
+    def _record_memory(self, params, memory, predicted=None):
+        """Feed a measured peak back into the memory model and log it next to the prediction"""
+        if memory['peak_bytes'] is None:
+            return
+        if predicted is None:
+            predicted = self.memory_model.predict(params)
+        self.memory_model.observe(params, predicted, memory['peak_bytes'], memory['exclusive'])
+        logger.info(f"GPU memory peak {memory['peak_bytes'] / 1024 ** 2:.0f} MB, predicted "
+                    f"{predicted / 1024 ** 2:.0f} MB ({'exclusive' if memory['exclusive'] else 'shared'})")
+
+    def _release_memory(self, force=False):
+        """Return cached allocator blocks to the device, only under memory pressure unless forced
+
+        Keeping the cache between requests saves the next request from
+        re-allocating it; it is released once reserved memory nears the device
+        size, or after an out-of-memory error.
+        """
+        if self.device != 'cuda':
+            return
+        total = torch.cuda.get_device_properties(0).total_memory
+        if force or torch.cuda.memory_reserved() > total * GPU_MEMORY_RELEASE_FRACTION:
+            torch.cuda.empty_cache()
+            self._memory_releases += 1
+
+    def memory_stats(self):
+        """Memory model calibration and allocator cache releases"""
+        result = self.memory_model.stats()
+        result['cache_releases'] = self._memory_releases
+        result['out_of_memory'] = self._out_of_memory
+        if self.device == 'cuda':
+            result['allocated_bytes'] = torch.cuda.memory_allocated()
+            result['reserved_bytes'] = torch.cuda.memory_reserved()
+        return result
+
+    def _load_rembg(self):
+        logger.info("Loading background remover...")
+        with self.startup_report.phase('rembg', 'load'):
+            return BackgroundRemover()
+
+    def _local_model_dir(self, model_path, subfolder):
+        """Where hy3dgen looks for already-downloaded weights"""
+        base_dir = os.environ.get('HY3DGEN_MODELS', '~/.cache/hy3dgen')
+        return os.path.expanduser(os.path.join(base_dir, model_path, subfolder))
+
+    def _load_shape_pipeline(self):
+        """Same steps as Hunyuan3DDiTFlowMatchingPipeline.from_pretrained, split into timed phases"""
+        report = self.startup_report
+        logger.info("Loading shape generation pipeline...")
+        
+        with report.phase('shape', 'resolve') as info:
+            info['cached'] = os.path.exists(self._local_model_dir(SHAPE_MODEL_PATH, SHAPE_SUBFOLDER))
+        with report.phase('shape', 'download'):
+            config_path, ckpt_path = smart_load_model(
+                SHAPE_MODEL_PATH, subfolder=SHAPE_SUBFOLDER, use_safetensors=True, variant='fp16')
+            # enable_flashvdm swaps in the turbo VAE; fetch it now instead of under the device lock
+            smart_load_model(SHAPE_MODEL_PATH, subfolder=SHAPE_VAE_SUBFOLDER, use_safetensors=True, variant='fp16')
+        with report.phase('shape', 'deserialize'):
+            pipeline = Hunyuan3DDiTFlowMatchingPipeline.from_single_file(
+                ckpt_path,
+                config_path,
+                device='cpu',
+                dtype=torch.float16,
+                use_safetensors=True,
+                from_pretrained_kwargs=dict(
+                    model_path=SHAPE_MODEL_PATH,
+                    subfolder=SHAPE_SUBFOLDER,
+                    use_safetensors=True,
+                    variant='fp16',
+                    dtype=torch.float16,
+                    device=self.device,
+                ),
+            )
+        
+        with self._device_lock:
+            with report.phase('shape', 'to_device'):
+                pipeline.to(device=self.device)
+                self._synchronize()
+            with report.phase('shape', 'flashvdm_enable'):
+                pipeline.enable_flashvdm(mc_algo='mc')
+                self._synchronize()
+        return pipeline
+
+    def _download_texture_weights(self):
+        """Fetch the paint pipeline weights ahead of time (disk only, no GPU memory)"""
+        report = self.startup_report
+        with report.phase('texture', 'resolve') as info:
+            info['cached'] = all(
+                os.path.exists(self._local_model_dir(TEXTURE_MODEL_PATH, subfolder))
+                for subfolder in TEXTURE_SUBFOLDERS
+            )
+        if not info['cached']:
+            with report.phase('texture', 'download'):
+                huggingface_hub.snapshot_download(
+                    repo_id=TEXTURE_MODEL_PATH,
+                    allow_patterns=[f'{subfolder}/*' for subfolder in TEXTURE_SUBFOLDERS],
+                )
+
+    def _load_texture_pipeline(self):
+        """Loader for self.texture_pipeline; also used for lazy loads after startup"""
+        with self._device_lock:
+            with self.startup_report.phase('texture', 'deserialize_to_device'):
+                return Hunyuan3DPaintPipeline.from_pretrained(TEXTURE_MODEL_PATH, subfolder=TEXTURE_PAINT_SUBFOLDER)
+
+    def _move_texture_pipeline(self, pipeline_tex, device):
+        """Move the paint pipeline's diffusion models between GPU and host memory"""
+        for model in pipeline_tex.models.values():
+            model.pipeline.to(device)
+        if device == 'cpu' and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
     def load_image_from_base64(self, image_b64):
         """Load image from base64 string"""
-        return Image.open(BytesIO(base64.b64decode(image_b64)))
+        return open_image(base64.b64decode(image_b64), IMAGE_MAX_SIDE)[0]
+
+    def fetch_image(self, uri):
+        """Read the image behind image_uri: s3://bucket/key, or a path under IMAGE_LOCAL_ROOT"""
+        if uri.startswith('s3://'):
+            return s3_io.read_bytes(uri, max_bytes=IMAGE_MAX_BYTES)
+        if not IMAGE_LOCAL_ROOT:
+            raise ValueError("Local image_uri paths are disabled (set IMAGE_LOCAL_ROOT)")
+        root = os.path.realpath(IMAGE_LOCAL_ROOT)
+        path = os.path.realpath(os.path.join(root, uri[len('file://'):] if uri.startswith('file://') else uri))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"image_uri is outside IMAGE_LOCAL_ROOT: {uri}")
+        if os.path.getsize(path) > IMAGE_MAX_BYTES:
+            raise ValueError(f"{uri} is over the {IMAGE_MAX_BYTES} byte limit")
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def parse_params(self, input_data):
+        """Canonical generation parameters with the official defaults applied"""
+        params = {
+            'seed': int(input_data.get('seed', 1234)),
+            'octree_resolution': int(input_data.get('octree_resolution', 128)),
+            'num_inference_steps': int(input_data.get('num_inference_steps', 5)),
+            'guidance_scale': float(input_data.get('guidance_scale', 5.0)),
+            'texture': bool(input_data.get('texture', False)),
+            'postprocess': bool(input_data.get('postprocess', False)),
+            'type': str(input_data.get('type', 'glb')).lower(),
+        }
+        # face_count only affects post-processing (always part of the texture path)
+        if params['texture'] or params['postprocess']:
+            params['face_count'] = int(input_data.get('face_count', 40000))
+        # Seed sweep: several variants of one image from one batched diffusion pass
+        if input_data.get('seeds'):
+            seeds = _int_list(input_data['seeds'], 'seeds')
+            if len(set(seeds)) != len(seeds):
+                raise ValueError(f"seeds must be distinct, got {seeds}")
+            if len(seeds) > MAX_SEEDS_PER_REQUEST:
+                raise ValueError(f"At most {MAX_SEEDS_PER_REQUEST} seeds per request, got {len(seeds)}")
+            if input_data.get('lod_face_counts'):
+                raise ValueError("seeds cannot be combined with lod_face_counts")
+            del params['seed']
+            params['seeds'] = seeds
+        # Multi-LOD output: one generation, one incremental decimation chain, finest level first
+        if input_data.get('lod_face_counts'):
+            if params['texture']:
+                raise ValueError("lod_face_counts is only supported for shape-only requests")
+            lod_face_counts = _int_list(input_data['lod_face_counts'], 'lod_face_counts')
+            if min(lod_face_counts) <= 0:
+                raise ValueError(f"lod_face_counts must be positive, got {lod_face_counts}")
+            params['lod_face_counts'] = sorted(set(lod_face_counts), reverse=True)
+            params['lod_format'] = str(input_data.get('lod_format', 'separate')).lower()
+            if params['lod_format'] not in ('separate', 'scene'):
+                raise ValueError(f"Unsupported lod_format: {params['lod_format']} (expected 'separate' or 'scene')")
+            if params['lod_format'] == 'scene' and params['type'] != 'glb':
+                raise ValueError("lod_format 'scene' requires type 'glb'")
+        # Output compression: geometry steps (untextured glb only), then an optional gzip/zstd codec
+        compression = parse_compression(input_data.get('compression'))
+        if compression:
+            if 'lod_face_counts' in params:
+                raise ValueError("compression is not supported together with lod_face_counts")
+            if any(step in GEOMETRY_STEPS for step in compression) and (params['texture'] or params['type'] != 'glb'):
+                raise ValueError(f"Compression {compression} with geometry steps requires an untextured glb")
+            params['compression'] = compression
+        return params
+
+    def parse_queue_timeout(self, input_data):
+        """Seconds the request may wait for a GPU slot (None for the server default); not part of params"""
+        if input_data.get('queue_timeout') is None:
+            return None
+        queue_timeout = float(input_data['queue_timeout'])
+        if not queue_timeout >= 0:
+            raise ValueError(f"queue_timeout must be a non-negative number, got {input_data['queue_timeout']}")
+        return queue_timeout
+
+    def _synchronize(self):
+        """Wait for queued GPU work so it is attributed to the stage that issued it"""
+        if self.device == 'cuda':
+            torch.cuda.synchronize()
 
     @torch.inference_mode()
-    def generate_shape(self, image, seed=1234, octree_resolution=128, num_inference_steps=5, guidance_scale=5.0):
-        """Generate 3D shape from image following official pattern"""
+    def generate_shape(self, image, seed=1234, octree_resolution=128, num_inference_steps=5, guidance_scale=5.0,
+                       timings=None, remove_background=True, preview_resolution=None, on_preview=None, seeds=None):
+        """Generate 3D shape from image following official pattern
+
+        Pass remove_background=False when the image has already been through
+        self.background. With preview_resolution and on_preview, a coarse mesh
+        decoded from the same latents is passed to on_preview before the
+        full-resolution mesh is decoded (such requests are not batched).
+        With seeds, returns one mesh per seed from a single batched pass.
+        """
+        timings = timings or RequestTimings()
         try:
             logger.info("Generating 3D shape...")
             
-            # Remove background
-            image = self.rembg(image)
+            # Remove background (skipped for already-matted inputs, memoized for repeats)
+            if remove_background:
+                image, _ = self.background.process(image, timings)
             
-            # Setup generation parameters
-            generator = torch.Generator(self.device).manual_seed(seed)
+            if seeds:
+                # Seed sweep: the same conditioning image in one batched pass, one generator per seed,
+                # so each mesh matches a single-seed call with that seed
+                return self.generate_shape_batch(
+                    [image] * len(seeds),
+                    list(seeds),
+                    octree_resolution=octree_resolution,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    timings=[timings] + [None] * (len(seeds) - 1),
+                )
             
-            start_time = time.time()
-            mesh = self.pipeline(
-                image=image,
-                generator=generator,
+            if on_preview is not None and preview_resolution:
+                return self.generate_shape_batch(
+                    [image],
+                    [seed],
+                    octree_resolution=octree_resolution,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    timings=[timings],
+                    preview_resolution=preview_resolution,
+                    on_preview=lambda meshes: on_preview(meshes[0]),
+                )[0]
+            
+            if self.shape_batcher is not None:
+                # Hand off to the batching scheduler, which shares one DiT pass with compatible requests
+                return self.shape_batcher.submit(
+                    image,
+                    seed=seed,
+                    octree_resolution=octree_resolution,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    timings=timings,
+                ).result()
+            
+            return self.generate_shape_batch(
+                [image],
+                [seed],
                 octree_resolution=octree_resolution,
                 num_inference_steps=num_inference_steps,
                 guidance_scale=guidance_scale,
-                mc_algo='mc'
+                timings=[timings],
             )[0]
             
-            logger.info(f"--- {time.time() - start_time} seconds ---")
-            return mesh
-            
         except Exception as e:
             logger.error(f"Error generating shape: {str(e)}")
             raise
 
     @torch.inference_mode()
-    def generate_texture(self, mesh, image, max_facenum=40000):
+    def generate_shape_batch(self, images, seeds, octree_resolution=128, num_inference_steps=5, guidance_scale=5.0,
+                             timings=None, preview_resolution=None, on_preview=None):
+        """Run one batched shape pipeline call with a generator per image
+
+        Sampling and volume decoding are run as two calls so each can be timed;
+        timings holds one RequestTimings (or None) per image. If on_preview is
+        given, the latents are first decoded at preview_resolution and the
+        coarse meshes passed to it; the full decode reuses the same latents.
+        """
+        generators = [torch.Generator(self.device).manual_seed(seed) for seed in seeds]
+        
+        start_time = time.time()
+        latents = self.pipeline(
+            image=images,
+            generator=generators,
+            octree_resolution=octree_resolution,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            mc_algo='mc',
+            output_type='latent'
+        )
+        self._synchronize()
+        sampled_time = time.time()
+        
+        preview_time = sampled_time
+        if on_preview is not None and preview_resolution:
+            # Coarse meshes first; decoding does not modify the latents, so nothing is resampled
+            on_preview(self._decode_latents(latents, preview_resolution))
+            preview_time = time.time()
+        
+        meshes = self._decode_latents(latents, octree_resolution)
+        end_time = time.time()
+        
+        for item_timings in timings or []:
+            if item_timings is not None:
+                item_timings.add('dit_sampling', sampled_time - start_time)
+                if preview_time > sampled_time:
+                    item_timings.add('preview', preview_time - sampled_time)
+                item_timings.add('volume_decoding', end_time - preview_time)
+        
+        logger.info(f"--- {end_time - start_time} seconds (batch of {len(images)}) ---")
+        return meshes
+
+    def _decode_latents(self, latents, octree_resolution):
+        """Volume decoding and marching cubes at the given octree resolution"""
+        # Same settings the pipeline uses when it exports meshes itself
+        meshes = self.pipeline._export(
+            latents,
+            output_type='trimesh',
+            box_v=1.01,
+            mc_level=0.0,
+            num_chunks=8000,
+            octree_resolution=octree_resolution,
+            mc_algo='mc',
+            enable_pbar=False
+        )
+        self._synchronize()
+        return meshes
+
+    @torch.inference_mode()
+    def generate_texture(self, mesh, image, max_facenum=40000, timings=None):
         """Generate texture following official pattern"""
+        timings = timings or RequestTimings()
         try:
             logger.info("Generating texture...")
             
-            # Apply postprocessors in exact order from official API
-            mesh = FloaterRemover()(mesh)
-            mesh = DegenerateFaceRemover()(mesh)
-            mesh = FaceReducer()(mesh, max_facenum=max_facenum)
-            mesh = self.pipeline_tex(mesh, image)
+            # Apply postprocessors in exact order from official API (on the process pool)
+            mesh = self.postprocessor.process(mesh, max_facenum=max_facenum, timings=timings)
+            # Loads the pipeline on first use, or brings it back from host memory
+            acquire_start = time.perf_counter()
+            with self.texture_pipeline.acquire() as pipeline_tex:
+                timings.add('texture_pipeline_acquire', time.perf_counter() - acquire_start)
+                with timings.stage('texture_painting'):
+                    mesh = pipeline_tex(mesh, image)
+                    self._synchronize()
             
             return mesh
             
         except Exception as e:
             logger.error(f"Texture generation failed: {str(e)}")
             logger.info("Returning original mesh without texture")
+            if isinstance(e, torch.cuda.OutOfMemoryError):
+                # The request still succeeds untextured, so the OOM is handled here rather than in predict_fn
+                self._out_of_memory += 1
+                self._release_memory(force=True)
+            # Lets callers tell a degraded result apart (e.g. to keep it out of the result cache)
+            mesh.metadata['texture_failed'] = True
             return mesh
 
+    def export_mesh(self, mesh, file_type='glb'):
+        """Serialize mesh to bytes in memory, once per request"""
+        try:
+            return export_mesh(mesh, file_type)
+        except Exception as e:
+            logger.error(f"Error exporting mesh: {str(e)}")
+            raise
+
     def save_mesh(self, mesh, output_path, file_type='glb'):
         """Save mesh to file following official pattern"""
         try:
-            with tempfile.NamedTemporaryFile(suffix=f'.{file_type}', delete=False) as temp_file:
-                mesh.export(temp_file.name)
-                mesh = trimesh.load(temp_file.name)
-                mesh.export(output_path)
+            with open(output_path, 'wb') as f:
+                f.write(self.export_mesh(mesh, file_type))
             
             logger.info(f"Mesh saved to: {output_path}")
             return output_path
@@ -140,67 +744,348 @@ class ModelHandler:
         else:
             raise ValueError(f"Unsupported content type: {request_content_type}")
 
-    def predict_fn(self, input_data, model):
-        """SageMaker prediction function following official generate() pattern"""
+    def _completed(self, mesh_bytes, file_type, raw, timings, return_timings=False, parts=None, uploads=None,
+                   **extra):
+        """Build a completed prediction holding either raw bytes or base64 text
+
+        With parts ('lods' or 'variants'), mesh_bytes is a pack_parts() blob and
+        is returned as a list under that key with one buffer per mesh. With
+        uploads (one upload result per mesh), the meshes are already in S3 and
+        only their URI, size and checksum are returned.
+        """
+        result = {'status': 'completed', 'type': file_type}
+        with timings.stage('response_encoding'):
+            if parts and uploads:
+                result[parts] = [dict(info, **upload) for (info, _), upload in zip(unpack_parts(mesh_bytes), uploads)]
+            elif parts:
+                result[parts] = [dict(info, model_bytes=bytes(data)) for info, data in unpack_parts(mesh_bytes)]
+            elif uploads:
+                result.update(uploads[0])
+            else:
+                result['model_bytes'] = mesh_bytes
+            if not raw:
+                encode_model_bytes(result)
+        result.update(extra)
+        if return_timings:
+            result['timings'] = dict(timings.stages)
+        REQUESTS.inc('completed')
+        return result
+
+    def _export_one(self, mesh, params, report):
+        """Export one mesh with the requested compression; the compression report goes into report"""
+        if params.get('compression'):
+            mesh_bytes, report['compression'] = compress_mesh(mesh, params['type'], params['compression'])
+            return mesh_bytes
+        return self.export_mesh(mesh, params['type'])
+
+    def _start_upload(self, output_uri, suffix, data, file_type, codec):
+        """Upload one exported mesh in the background; returns a future of its URI, size and checksum"""
+        return self.upload_executor.submit(
+            s3_io.upload_bytes,
+            s3_io.suffixed_uri(output_uri, suffix),
+            data,
+            content_type=mesh_content_type(file_type),
+            content_encoding=codec,
+        )
+
+    def _upload_outputs(self, output_uri, mesh_bytes, file_type, parts, codec):
+        """Upload a finished result, one object per packed part"""
+        items = [(part_suffix(info), data) for info, data in unpack_parts(mesh_bytes)] if parts else [('', mesh_bytes)]
+        futures = [self._start_upload(output_uri, suffix, data, file_type, codec) for suffix, data in items]
+        return [future.result() for future in futures]
+
+    def _preview_publisher(self, on_preview, file_type, resolution, raw, timings):
+        """Wrap on_preview so it receives an exported preview result; failures never fail the request"""
+        started = time.time()
+        
+        def publish(mesh):
+            try:
+                with timings.stage('preview_export'):
+                    preview = {
+                        'status': 'preview',
+                        'type': file_type,
+                        'octree_resolution': resolution,
+                        'model_bytes': self.export_mesh(mesh, file_type),
+                    }
+                if not raw:
+                    encode_model_bytes(preview)
+                preview['elapsed_seconds'] = time.time() - started
+                on_preview(preview)
+            except Exception as e:
+                logger.warning(f"Publishing preview failed: {str(e)}")
+        
+        return publish
+
+    def predict_fn(self, input_data, model, progress=None, raw=False, admission_bounded=True, on_preview=None):
+        """SageMaker prediction function following official generate() pattern
+
+        progress is called with each stage name as it starts; raw=True returns
+        'model_bytes' instead of 'model_base64'. AdmissionRejected is raised so
+        the server can answer 429/503. Request fields are documented in the README.
+        """
+        report = progress or (lambda stage: None)
+        timings = RequestTimings()
+        return_timings = bool(input_data.get('return_timings', False))
+        flight_key = None
         try:
             # Check if model is loaded
             if not self.model_loaded:
+                REQUESTS.inc('loading')
                 return {
                     'error': 'Model not loaded yet, please wait',
                     'status': 'loading'
                 }
             
             # Parse input - support both 'image' and 'text' like official API
-            if 'image' in input_data:
-                image = self.load_image_from_base64(input_data['image'])
+            if 'image_bytes' in input_data:
+                # Already decoded by an HTTP front-end worker
+                image_bytes = input_data['image_bytes']
+            elif 'image' in input_data:
+                report('decode')
+                with timings.stage('decode_base64'):
+                    image_bytes = base64.b64decode(input_data['image'])
+            elif 'image_uri' in input_data:
+                report('fetch')
+                with timings.stage('image_fetch'):
+                    image_bytes = self.fetch_image(input_data['image_uri'])
             else:
                 raise ValueError("No input image provided")
+            # Where to upload the mesh instead of returning it; not part of params (or the cache key)
+            output_uri = input_data.get('output_uri')
+            try:
+                params = self.parse_params(input_data)
+                queue_timeout = self.parse_queue_timeout(input_data)
+                if output_uri:
+                    s3_io.parse_s3_uri(output_uri)
+            except (TypeError, ValueError) as e:
+                raise InvalidRequest(str(e)) from e
+            seeds = params.get('seeds')
+            if seeds:
+                parts = 'variants'
+            elif params.get('lod_format') == 'separate':
+                parts = 'lods'
+            else:
+                parts = None
+            # Clients must decompress when a payload codec was applied (also for cache hits)
+            codec = content_encoding(params.get('compression', []))
+            encoding = {'content_encoding': codec} if codec else {}
             
-            # Generate shape with official parameters
-            mesh = self.generate_shape(
-                image=image,
-                seed=input_data.get('seed', 1234),
-                octree_resolution=input_data.get('octree_resolution', 128),
-                num_inference_steps=input_data.get('num_inference_steps', 5),
-                guidance_scale=input_data.get('guidance_scale', 5.0)
-            )
+            # Identical image + parameters return the stored result with no GPU work
+            key = None
+            if self.result_cache is not None:
+                with timings.stage('cache_lookup'):
+                    key = cache_key(image_bytes, params)
+                    cached = self.result_cache.get(key)
+                if cached is not None:
+                    logger.info(f"Result cache hit: {key[:12]}")
+                    uploads = None
+                    if output_uri:
+                        with timings.stage('upload'):
+                            uploads = self._upload_outputs(output_uri, cached, params['type'], parts, codec)
+                    return self._completed(cached, params['type'], raw, timings, return_timings,
+                                           parts=parts, uploads=uploads, cache='hit', **encoding)
             
-            # Generate texture if requested
-            if input_data.get('texture', False):
-                mesh = self.generate_texture(
-                    mesh, 
-                    image, 
-                    max_facenum=input_data.get('face_count', 40000)
-                )
+            # An identical request already being generated is waited for rather than run again
+            if self.inflight is not None:
+                request_key = key or cache_key(image_bytes, params)
+                flight, leader = self.inflight.join(request_key)
+                if leader:
+                    flight_key = request_key
+                else:
+                    logger.info(f"Coalesced with in-flight request: {request_key[:12]}")
+                    report('coalesced')
+                    with timings.stage('coalesced_wait'):
+                        mesh_bytes, rembg_status = flight.result()
+                    uploads = None
+                    if output_uri:
+                        with timings.stage('upload'):
+                            uploads = self._upload_outputs(output_uri, mesh_bytes, params['type'], parts, codec)
+                    return self._completed(mesh_bytes, params['type'], raw, timings, return_timings,
+                                           parts=parts, uploads=uploads, coalesced=True,
+                                           cache='miss' if key is not None else 'disabled', rembg=rembg_status,
+                                           **encoding)
             
-            # Save mesh
-            file_type = input_data.get('type', 'glb')
-            output_path = f'/tmp/output.{file_type}'
-            self.save_mesh(mesh, output_path, file_type)
+            # Preview mode does not change the final mesh, so it is not part of params (or the cache key)
+            shape_preview = {}
+            preview_resolution = int(input_data.get('preview_octree_resolution', PREVIEW_OCTREE_RESOLUTION))
+            if (on_preview is not None and input_data.get('preview') and not seeds
+                    and preview_resolution < params['octree_resolution']):
+                shape_preview = {
+                    'preview_resolution': preview_resolution,
+                    'on_preview': self._preview_publisher(on_preview, params['type'], preview_resolution, raw, timings),
+                }
             
-            # Clean up GPU memory
-            torch.cuda.empty_cache()
+            if 'image_decoded' in input_data:
+                # Decoded, EXIF-transposed and downscaled by an HTTP front-end worker
+                image, image_info = input_data['image_decoded']
+            else:
+                with timings.stage('image_open'):
+                    image, image_info = open_image(image_bytes, IMAGE_MAX_SIDE)
+            if max(image_info['size']) < max(image_info['source_size']):
+                logger.info(f"Downscaled {image_info['format']} input {image_info['source_size']} -> {image_info['size']}")
             
-            # Return base64 encoded result like official API
-            with open(output_path, 'rb') as f:
-                mesh_data = base64.b64encode(f.read()).decode()
+            # Background removal is CPU work, so it runs before taking a GPU slot
+            report('rembg')
+            matted, rembg_status = self.background.process(image, timings)
             
+            # Wait for a GPU slot and room in the memory budget; raises AdmissionRejected when saturated
+            predicted_memory = self.memory_model.predict(params)
+            admission_start = time.perf_counter()
+            with self.admission.admit(timeout=queue_timeout, bounded=admission_bounded, memory=predicted_memory):
+                timings.add('admission_wait', time.perf_counter() - admission_start)
+                
+                # Loading the texture weights happens before the measured window so it is not part of the peak
+                with self._texture_on_device(params['texture'], timings), self._memory_window() as memory:
+                    # Generate shape with official parameters
+                    report('shape')
+                    shape_args = dict(
+                        image=matted,
+                        remove_background=False,
+                        octree_resolution=params['octree_resolution'],
+                        num_inference_steps=params['num_inference_steps'],
+                        guidance_scale=params['guidance_scale'],
+                        timings=timings
+                    )
+                    if seeds:
+                        meshes = self.shape_stage.run(seeds=seeds, **shape_args)
+                    else:
+                        meshes = [self.shape_stage.run(seed=params['seed'], **shape_args, **shape_preview)]
+                    
+                    # Generate texture if requested
+                    if params['texture']:
+                        report('texture')
+                        meshes = [
+                            self.texture_stage.run(mesh, image, max_facenum=params['face_count'], timings=timings)
+                            for mesh in meshes
+                        ]
+            # A failed texture pass did not reach its usual peak, so it would under-calibrate the model
+            texture_failed = any(mesh.metadata.get('texture_failed') for mesh in meshes)
+            if not texture_failed:
+                self._record_memory(params, memory, predicted_memory)
+            memory_report = {'gpu_memory_predicted_bytes': predicted_memory}
+            if memory['peak_bytes'] is not None:
+                memory_report['gpu_memory_peak_bytes'] = memory['peak_bytes']
+            
+            # Optional post-processing for shape-only requests; CPU work, so it runs after the GPU slot is released
+            lod_face_counts = params.get('lod_face_counts')
+            if lod_face_counts:
+                report('postprocess')
+                lod_meshes = self.postprocessor.process_lods(meshes[0], lod_face_counts, timings=timings)
+            elif params['postprocess'] and not params['texture']:
+                report('postprocess')
+                meshes = [
+                    self.postprocessor.process(mesh, max_facenum=params['face_count'], timings=timings)
+                    for mesh in meshes
+                ]
+            
+            # Export mesh in memory (no shared output file between concurrent requests)
+            report('export')
+            file_type = params['type']
+            uploads = []
+            
+            def exported(data, info=None):
+                # With output_uri, each mesh starts uploading while the next one is serialized
+                if output_uri:
+                    suffix = part_suffix(info) if info else ''
+                    uploads.append(self._start_upload(output_uri, suffix, data, file_type, codec))
+                return data
+            
+            with timings.stage('export'):
+                if seeds:
+                    variants = []
+                    for seed, mesh in zip(seeds, meshes):
+                        info = {'seed': seed, 'faces': len(mesh.faces), 'vertices': len(mesh.vertices)}
+                        variants.append((info, exported(self._export_one(mesh, params, info), info)))
+                    mesh_bytes = pack_parts(variants)
+                elif not lod_face_counts:
+                    mesh_bytes = exported(self._export_one(meshes[0], params, encoding))
+                elif parts == 'lods':
+                    levels = []
+                    for level, (lod, face_count) in enumerate(zip(lod_meshes, lod_face_counts)):
+                        info = {'level': level, 'face_count': face_count, 'faces': len(lod.faces),
+                                'vertices': len(lod.vertices)}
+                        levels.append((info, exported(self.export_mesh(lod, file_type), info)))
+                    mesh_bytes = pack_parts(levels)
+                else:
+                    mesh_bytes = exported(export_lod_scene(lod_meshes, lod_face_counts))
+            
+            # Keep the allocator cache for the next request unless the device is running out
+            self._release_memory()
+            
+            # The mesh is shared as soon as it exists: waiters upload to their own output_uri,
+            # and a failure of this request's upload is not theirs
+            if key is not None and not texture_failed:
+                self.result_cache.put(key, mesh_bytes)
+            if flight_key is not None:
+                # After the cache put, so a request arriving once the flight is gone finds the cache entry
+                self.inflight.finish(flight_key, result=(mesh_bytes, rembg_status))
+                flight_key = None
+            
+            if uploads:
+                report('upload')
+                # Only the part of the upload that did not overlap with the export is waited for here
+                with timings.stage('upload'):
+                    uploads = [future.result() for future in uploads]
+            
+            # Return base64 encoded result like official API (or raw bytes for binary responses)
+            return self._completed(
+                mesh_bytes,
+                file_type,
+                raw,
+                timings,
+                return_timings,
+                parts=parts,
+                uploads=uploads or None,
+                cache='miss' if key is not None else 'disabled',
+                rembg=rembg_status,
+                **memory_report,
+                **encoding
+            )
+            
+        except AdmissionRejected as e:
+            REQUESTS.inc('rejected')
+            if flight_key is not None:
+                self.inflight.finish(flight_key, error=e)
+            raise
+        except InvalidRequest as e:
+            logger.warning(f"Invalid request: {str(e)}")
+            REQUESTS.inc('invalid')
             return {
-                'model_base64': mesh_data,
-                'status': 'completed'
+                'error': str(e),
+                'status': 'invalid'
             }
-            
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
-            return {
+            if flight_key is not None:
+                # Waiters fail with the same error; nothing is cached, so the next request retries
+                self.inflight.finish(flight_key, error=e)
+            if isinstance(e, torch.cuda.OutOfMemoryError):
+                self._out_of_memory += 1
+                self._release_memory(force=True)
+            REQUESTS.inc('failed')
+            result = {
                 'error': str(e),
                 'status': 'failed'
             }
+            if return_timings:
+                result['timings'] = dict(timings.stages)
+            return result
 
     def output_fn(self, prediction, accept):
         """SageMaker output processing function"""
         if accept == 'application/json':
-            return json.dumps(prediction), accept
+            prediction = dict(prediction)
+            for key in PART_KEYS:
+                if key in prediction:
+                    prediction[key] = [dict(part) for part in prediction[key]]
+            return json.dumps(encode_model_bytes(prediction)), accept
+        elif accept in BINARY_CONTENT_TYPES:
+            # Errors (and multi-mesh results) stay JSON so clients can tell them apart by content type
+            if prediction.get('status') != 'completed' or any(key in prediction for key in PART_KEYS):
+                return self.output_fn(prediction, 'application/json')
+            if 'model_bytes' in prediction:
+                return prediction['model_bytes'], accept
+            return base64.b64decode(prediction['model_base64']), accept
         else:
             raise ValueError(f"Unsupported accept type: {accept}")
 
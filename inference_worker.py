@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+GPU inference worker: owns ModelHandler and the job pool, serves the HTTP front ends
+"""
+import logging
+import os
+import threading
+
+from jobs import JobManager
+from metrics import REGISTRY, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def create_job_manager(handler):
+    """Bounded job pool with a TTL result store (async job mode)"""
+    return JobManager(
+        run=lambda input_data, progress, preview: handler.predict_fn(
+            input_data, handler, progress=progress, on_preview=preview, admission_bounded=False),
+        ready=lambda: handler.model_loaded,
+        max_workers=int(os.environ.get('JOB_WORKERS', '1')),
+        max_pending=int(os.environ.get('JOB_QUEUE_MAX', '64')),
+        max_entries=int(os.environ.get('JOB_STORE_MAX_ENTRIES', '256')),
+        ttl_seconds=float(os.environ.get('JOB_RESULT_TTL_SECONDS', '3600')),
+        max_bytes=int(os.environ.get('JOB_STORE_MAX_BYTES', str(1024 ** 3))),
+    )
+
+
+def register_collectors(handler, job_manager):
+    """Export component stats as Prometheus gauges"""
+    REGISTRY.add_collector('shape_batching', lambda: handler.shape_batcher and handler.shape_batcher.stats())
+    REGISTRY.add_collector('admission', handler.admission.stats)
+    REGISTRY.add_collector('texture_pipeline', handler.texture_pipeline.stats)
+    REGISTRY.add_collector('rembg', lambda: handler.background and handler.background.stats())
+    REGISTRY.add_collector('shape_stage', handler.shape_stage.stats)
+    REGISTRY.add_collector('texture_stage', handler.texture_stage.stats)
+    REGISTRY.add_collector('postprocess', handler.postprocessor.stats)
+    REGISTRY.add_collector('result_cache', lambda: handler.result_cache and handler.result_cache.stats())
+    REGISTRY.add_collector('coalescing', lambda: handler.inflight and handler.inflight.stats())
+    REGISTRY.add_collector('gpu_memory', handler.memory_stats)
+    REGISTRY.add_collector('jobs', job_manager.stats)
+
+
+def build_ops(handler, job_manager):
+    """Operations the front end can call; arguments and results are plain picklable data"""
+
+    def predict(input_data, raw=True, emit=None):
+        # emit (streaming calls only) receives the preview result before the final one
+        return handler.predict_fn(input_data, handler, raw=raw, on_preview=emit)
+
+    def status():
+        return {'model_loaded': handler.model_loaded, 'ready': handler.ready}
+
+    def stats():
+        result = status()
+        if handler.shape_batcher is not None:
+            result['shape_batching'] = handler.shape_batcher.stats()
+        result['admission'] = handler.admission.stats()
+        result['texture_pipeline'] = handler.texture_pipeline.stats()
+        if handler.background is not None:
+            result['rembg'] = handler.background.stats()
+        result['stages'] = {
+            'shape': handler.shape_stage.stats(),
+            'texture': handler.texture_stage.stats(),
+        }
+        result['postprocess'] = handler.postprocessor.stats()
+        if handler.result_cache is not None:
+            result['result_cache'] = handler.result_cache.stats()
+        if handler.inflight is not None:
+            result['coalescing'] = handler.inflight.stats()
+        result['gpu_memory'] = handler.memory_stats()
+        result['jobs'] = job_manager.stats()
+        return result
+
+    def submit_job(input_data, input_location=None, output_location=None):
+        job = job_manager.submit(input_data, input_location=input_location, output_location=output_location)
+        return {'job_id': job.job_id, 'status': job.status, 'output_location': job.output_location}
+
+    def get_job(job_id):
+        job = job_manager.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def observe(stages):
+        # Stage timings measured in the front-end processes (decode, encoding, serialization)
+        for name, seconds in stages.items():
+            STAGE_SECONDS.observe(seconds, name)
+
+    return {
+        'predict': predict,
+        'status': status,
+        'stats': stats,
+        'startup': lambda: handler.startup_report.to_dict(),
+        'metrics': REGISTRY.render,
+        'submit_job': submit_job,
+        'get_job': get_job,
+        'observe': observe,
+    }
+
+
+def start_loading(handler):
+    """Load models (and warm up) in the background so the server answers /ping meanwhile"""
+    def load():
+        try:
+            handler.load_models()
+            logger.info("Model loaded successfully!")
+        except Exception as e:
+            logger.error(f"Failed to load model: {e}")
+
+    threading.Thread(target=load, name='model-loader', daemon=True).start()
+
+
+def create_ops():
+    """Create the model handler in this process and return its operations"""
+    from inference import model_handler
+
+    job_manager = create_job_manager(model_handler)
+    register_collectors(model_handler, job_manager)
+    start_loading(model_handler)
+    return build_ops(model_handler, job_manager)
+
+
+def main(address, authkey):
+    """Entry point of the GPU inference worker process"""
+    logging.basicConfig(level=logging.INFO)
+    from ipc import WorkerServer
+
+    WorkerServer(create_ops(), address, authkey).serve_forever()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local IPC between the HTTP front-end workers and the GPU inference worker process
+"""
+import logging
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from admission import AdmissionRejected
+from jobs import JobQueueFull
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(Exception):
+    """Raised when the inference worker cannot be reached (not started yet or gone)"""
+
+
+class RemoteError(Exception):
+    """An unexpected exception raised inside the inference worker"""
+
+
+def _encode_error(e):
+    """Exceptions cross the socket as plain data; only the ones callers handle keep their type"""
+    if isinstance(e, AdmissionRejected):
+        return {'type': 'AdmissionRejected',
+                'args': (e.reason, e.status_code, e.retry_after, e.in_flight, e.queued)}
+    if isinstance(e, JobQueueFull):
+        return {'type': 'JobQueueFull', 'args': (str(e),)}
+    return {'type': 'RemoteError', 'args': (f'{type(e).__name__}: {e}',)}
+
+
+def _decode_error(error):
+    types = {'AdmissionRejected': AdmissionRejected, 'JobQueueFull': JobQueueFull, 'RemoteError': RemoteError}
+    return types[error['type']](*error['args'])
+
+
+class LocalBackend:
+    """Calls the operations in this process (single-process Flask mode)"""
+
+    def __init__(self, ops):
+        self.ops = ops
+
+    def call(self, op, **kwargs):
+        return self.ops[op](**kwargs)
+
+    def stream(self, op, **kwargs):
+        """Yield ('partial', value) for each value the operation emits, then ('ok', result)"""
+        messages = queue.Queue()
+
+        def run():
+            try:
+                messages.put(('ok', self.ops[op](emit=lambda value: messages.put(('partial', value)), **kwargs)))
+            except Exception as e:
+                messages.put(('error', e))
+
+        threading.Thread(target=run, name=f'{op}-stream', daemon=True).start()
+        while True:
+            kind, value = messages.get()
+            if kind == 'error':
+                raise value
+            yield kind, value
+            if kind == 'ok':
+                return
+
+
+class WorkerServer:
+    """Serves operations to the front-end workers over a Unix domain socket.
+
+    Each connection gets its own thread, so concurrent requests from several
+    front-end threads reach the batcher and admission controller together.
+    Messages are (op, kwargs, stream) tuples; replies are ('ok', value) or
+    ('error', data). Streaming calls get an emit callback whose values are
+    sent as ('partial', value) replies before the final one.
+    """
+
+    def __init__(self, ops, address, authkey):
+        self.ops = ops
+        self.address = address
+        self.authkey = authkey
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            logger.info(f"Inference worker listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    logger.warning(f"Rejected IPC connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._serve, args=(conn,), name='ipc-conn', daemon=True).start()
+
+    def _serve(self, conn):
+        send_lock = threading.Lock()
+
+        def emit(value):
+            # Called from whichever thread produces the partial result
+            with send_lock:
+                conn.send(('partial', value))
+
+        with conn:
+            while True:
+                try:
+                    op, kwargs, stream = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if stream:
+                    kwargs['emit'] = emit
+                try:
+                    reply = ('ok', self.ops[op](**kwargs))
+                except Exception as e:
+                    reply = ('error', _encode_error(e))
+                try:
+                    with send_lock:
+                        conn.send(reply)
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # Result could not be pickled; the connection is still usable
+                    with send_lock:
+                        conn.send(('error', _encode_error(e)))
+
+
+class WorkerClient:
+    """Pooled connections to the inference worker, safe to share between threads.
+
+    Connections are opened lazily and the pool is reset after a fork, so the
+    client can be created before gunicorn forks its workers.
+    """
+
+    def __init__(self, address, authkey, pool_size=8):
+        self.address = address
+        self.authkey = authkey
+        self.pool_size = max(1, int(pool_size))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._idle = None
+
+    def _pool(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = queue.LifoQueue()
+            return self._idle
+
+    def _connect(self):
+        pool = self._pool()
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise InferenceUnavailable(f"Inference worker not reachable at {self.address}: {str(e)}") from e
+
+    def _release(self, conn):
+        pool = self._pool()
+        if pool.qsize() < self.pool_size:
+            pool.put(conn)
+        else:
+            conn.close()
+
+    def call(self, op, **kwargs):
+        conn = self._connect()
+        try:
+            conn.send((op, kwargs, False))
+            status, value = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise InferenceUnavailable(f"Lost connection to the inference worker: {str(e)}") from e
+
+        self._release(conn)
+        if status == 'error':
+            raise _decode_error(value)
+        return value
+
+    def stream(self, op, **kwargs):
+        """Yield ('partial', value) for each value the operation emits, then ('ok', result)"""
+        conn = self._connect()
+        finished = False
+        try:
+            conn.send((op, kwargs, True))
+            while not finished:
+                try:
+                    kind, value = conn.recv()
+                except (OSError, EOFError) as e:
+                    raise InferenceUnavailable(f"Lost connection to the inference worker: {str(e)}") from e
+                finished = kind != 'partial'
+                if kind == 'error':
+                    raise _decode_error(value)
+                yield kind, value
+        finally:
+            # A stream abandoned halfway still has replies in flight, so its connection cannot be reused
+            if finished:
+                self._release(conn)
+            else:
+                conn.close()
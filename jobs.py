@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Asynchronous job execution for long-running (e.g. textured) generation requests
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import s3_io
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+def _payload_bytes(value):
+    """Approximate memory held by a result: the lengths of its strings and byte buffers"""
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_bytes(item) for item in value)
+    return 0
+
+
+class Job:
+    def __init__(self, job_id, input_data, input_location=None, output_location=None):
+        self.job_id = job_id
+        self.input_data = input_data
+        self.input_location = input_location
+        self.output_location = output_location
+        self.status = 'queued'
+        self.stages = []
+        self.result = None
+        self.preview = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Bytes of the stored result, counted against the manager's byte budget once finished
+        self.size = 0
+        # Stages are updated by the job worker while status requests serialize them
+        self._lock = threading.Lock()
+
+    def progress(self, stage):
+        """Mark the start of a stage, closing the previous one"""
+        with self._lock:
+            now = time.time()
+            if self.stages and self.stages[-1]['status'] == 'running':
+                self.stages[-1]['status'] = 'completed'
+                self.stages[-1]['seconds'] = now - self.stages[-1]['started_at']
+            self.stages.append({'name': stage, 'status': 'running', 'started_at': now})
+
+    def _close_stages(self, status):
+        with self._lock:
+            now = time.time()
+            if self.stages and self.stages[-1]['status'] == 'running':
+                self.stages[-1]['status'] = status
+                self.stages[-1]['seconds'] = now - self.stages[-1]['started_at']
+
+    def to_dict(self):
+        with self._lock:
+            stages = [{k: v for k, v in stage.items() if k != 'started_at'} for stage in self.stages]
+        data = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'stages': stages,
+            'created_at': self.created_at,
+        }
+        if self.started_at is not None:
+            data['queue_seconds'] = self.started_at - self.created_at
+        if self.finished_at is not None:
+            data['run_seconds'] = self.finished_at - self.started_at
+        if self.output_location:
+            data['output_location'] = self.output_location
+        if self.preview is not None:
+            data['preview'] = self.preview
+        if self.error is not None:
+            data['error'] = self.error
+        if self.result is not None:
+            data['result'] = self.result
+        return data
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps finished results with TTL eviction.
+
+    Follows the SageMaker async-inference contract: a job may reference its request
+    body by ``input_location`` (s3://...) and have its response written to
+    ``output_location`` instead of being kept in memory.
+    """
+
+    def __init__(self, run, ready=None, max_workers=1, max_pending=64, max_entries=256,
+                 ttl_seconds=3600, ready_timeout=1800, max_bytes=1024 ** 3):
+        # run(input_data, progress, preview) -> result dict with a 'status' key;
+        # preview(result) publishes an early, coarse result while the job runs
+        self.run = run
+        self.ready = ready
+        self.max_pending = max_pending
+        self.max_entries = max_entries
+        # Finished results (base64 meshes, tens of MB when textured) are also evicted by total size
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.ready_timeout = ready_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._evicted = 0
+        self._stored_bytes = 0
+
+    def submit(self, input_data, input_location=None, output_location=None):
+        """Queue a job and return it immediately"""
+        with self._lock:
+            self._evict()
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise JobQueueFull(f"Job queue is full ({self.max_pending} pending)")
+            job = Job(uuid.uuid4().hex, input_data, input_location, output_location)
+            if output_location and output_location.endswith('/'):
+                job.output_location = f'{output_location}{job.job_id}.out'
+            self._jobs[job.job_id] = job
+            self._pending += 1
+            self._submitted += 1
+
+        self._executor.submit(self._execute, job)
+        logger.info(f"Job {job.job_id} queued")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def _wait_ready(self):
+        if self.ready is None:
+            return
+        deadline = time.time() + self.ready_timeout
+        while not self.ready():
+            if time.time() > deadline:
+                raise TimeoutError('Model did not finish loading in time')
+            time.sleep(1)
+
+    def _execute(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            self._wait_ready()
+            input_data = job.input_data
+            if job.input_location:
+                job.progress('fetch_input')
+                input_data = s3_io.read_json(job.input_location)
+
+            result = self.run(input_data, job.progress, lambda preview: self._publish_preview(job, preview))
+
+            if job.output_location:
+                job.progress('write_output')
+                s3_io.write_json(job.output_location, result)
+            else:
+                job.result = result
+                # The final result supersedes the preview
+                job.preview = None
+
+            job._close_stages('completed')
+            job.status = result.get('status', 'completed')
+            if job.status in ('failed', 'invalid'):
+                job.error = result.get('error')
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {str(e)}")
+            job._close_stages('failed')
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.input_data = None
+            job.finished_at = time.time()
+            job.size = _payload_bytes(job.result) + _payload_bytes(job.preview)
+            with self._lock:
+                self._pending -= 1
+                self._stored_bytes += job.size
+                self._evict()
+            logger.info(f"Job {job.job_id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    def _publish_preview(self, job, preview):
+        """Expose a preview on the job; with an output_location it is written next to the output"""
+        if job.output_location:
+            location = f'{job.output_location}.preview'
+            s3_io.write_json(location, preview)
+            preview = {k: v for k, v in preview.items() if k != 'model_base64'}
+            preview['location'] = location
+        job.preview = preview
+        logger.info(f"Job {job.job_id} published a preview")
+
+    def _evict(self):
+        """Drop expired finished jobs, then the oldest finished ones beyond max_entries or max_bytes (lock held)"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > self.ttl_seconds]:
+            self._drop(job_id)
+
+        if len(self._jobs) > self.max_entries or self._stored_bytes > self.max_bytes:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]:
+                if len(self._jobs) <= self.max_entries and self._stored_bytes <= self.max_bytes:
+                    break
+                self._drop(job_id)
+
+    def _drop(self, job_id):
+        job = self._jobs.pop(job_id)
+        self._stored_bytes -= job.size
+        self._evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'stored': len(self._jobs),
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'evicted': self._evicted,
+                'stored_bytes': self._stored_bytes,
+            }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-request GPU memory estimates, calibrated from measured peaks
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Bytes per unit of each feature before calibration (rough figures for the mini turbo shape model with FlashVDM)
+DEFAULT_COEFFICIENTS = {
+    'base': 256 * 1024 ** 2,       # conditioning and scheduler state
+    'samples': 512 * 1024 ** 2,    # DiT activations per latent (guidance doubles the batch)
+    'voxels': 16,                  # volume decoding per grid point, octree_resolution ** 3 per latent
+    'textures': 6 * 1024 ** 3,     # multiview paint diffusion per textured mesh
+    'faces': 2048,                 # UV unwrapping and baking per face of a textured mesh
+}
+
+
+def memory_features(params):
+    """Feature counts of a request; the raw estimate is their dot product with the coefficients"""
+    samples = len(params.get('seeds') or ()) or 1
+    textured = samples if params.get('texture') else 0
+    return {
+        'base': 1,
+        'samples': samples,
+        'voxels': samples * params['octree_resolution'] ** 3,
+        'textures': textured,
+        'faces': textured * params.get('face_count', 0),
+    }
+
+
+class MemoryModel:
+    """Estimates the peak GPU memory a request adds on top of what is allocated when it starts.
+
+    The raw estimate is a weighted sum of memory_features(). Peaks measured
+    while a request had the GPU to itself calibrate it: the raw estimate is
+    scaled by a high percentile of the recent measured/raw ratios, kept apart
+    for shape-only and textured requests since they run different models.
+    """
+
+    def __init__(self, coefficients=None, window=32, percentile=0.9, min_scale=0.1, max_scale=10.0):
+        self.coefficients = dict(DEFAULT_COEFFICIENTS, **(coefficients or {}))
+        self.percentile = percentile
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+        self._lock = threading.Lock()
+        self._ratios = {'shape': deque(maxlen=window), 'texture': deque(maxlen=window)}
+        self._observed = 0
+        self._calibrated = 0
+        self._under_predicted = 0
+        self._abs_error_sum = 0.0
+
+    @staticmethod
+    def _kind(params):
+        return 'texture' if params.get('texture') else 'shape'
+
+    def _raw(self, params):
+        return sum(self.coefficients[name] * count for name, count in memory_features(params).items())
+
+    def _scale(self, kind):
+        """Calibration factor (lock held); 1.0 until a measurement of this kind exists"""
+        ratios = sorted(self._ratios[kind])
+        if not ratios:
+            return 1.0
+        ratio = ratios[min(len(ratios) - 1, int(self.percentile * len(ratios)))]
+        return min(self.max_scale, max(self.min_scale, ratio))
+
+    def predict(self, params):
+        """Estimated peak bytes of a request with these (canonical) parameters"""
+        raw = self._raw(params)
+        with self._lock:
+            return int(raw * self._scale(self._kind(params)))
+
+    def observe(self, params, predicted, peak, exclusive):
+        """Record a measured peak; only exclusive measurements (no overlapping request) calibrate the model"""
+        with self._lock:
+            self._observed += 1
+            self._abs_error_sum += abs(peak - predicted)
+            if peak > predicted:
+                self._under_predicted += 1
+            if exclusive:
+                self._ratios[self._kind(params)].append(peak / self._raw(params))
+                self._calibrated += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scale': {kind: self._scale(kind) for kind in self._ratios},
+                'observed': self._observed,
+                'calibrated': self._calibrated,
+                'under_predicted': self._under_predicted,
+                'mean_abs_error_bytes': self._abs_error_sum / self._observed if self._observed else None,
+            }
+
+
+class PeakTracker:
+    """Measures the device memory peak of each request's window on the GPU.
+
+    The allocator keeps one process-wide peak, so it is only reset when a
+    window opens on an idle device. A window that overlapped another one
+    reports their combined peak and is marked as not exclusive.
+    """
+
+    def __init__(self, allocated, max_allocated, reset_peak):
+        self.allocated = allocated
+        self.max_allocated = max_allocated
+        self.reset_peak = reset_peak
+
+        self._lock = threading.Lock()
+        self._active = []
+
+    @contextmanager
+    def window(self):
+        """Yields a dict that holds 'peak_bytes' and 'exclusive' once the block exits"""
+        record = {'peak_bytes': None, 'exclusive': True}
+        with self._lock:
+            if self._active:
+                record['exclusive'] = False
+                for other in self._active:
+                    other['exclusive'] = False
+            else:
+                self.reset_peak()
+            start = self.allocated()
+            self._active.append(record)
+        try:
+            yield record
+        finally:
+            with self._lock:
+                self._active = [other for other in self._active if other is not record]
+                record['peak_bytes'] = max(0, self.max_allocated() - start)
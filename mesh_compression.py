@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Compressed mesh encodings: compact indices, quantized positions, gzip/zstd payload compression
+"""
+import gzip
+import json
+import logging
+import struct
+import time
+
+import numpy as np
+
+from mesh_export import export_mesh
+
+logger = logging.getLogger(__name__)
+
+# Geometry steps rewrite the GLB; codec steps compress the final payload. Applied in this order.
+GEOMETRY_STEPS = ('indices', 'quantize')
+CODECS = ('gzip', 'zstd')
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# glTF accessor component types
+_UNSIGNED_BYTE = 5121
+_SHORT = 5122
+_UNSIGNED_SHORT = 5123
+_UNSIGNED_INT = 5125
+_FLOAT = 5126
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+
+def parse_compression(value):
+    """Canonical step list from a request value ("quantize,gzip" or ["quantize", "gzip"])"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    steps = {str(step).strip().lower() for step in value if str(step).strip()}
+    unknown = steps - set(GEOMETRY_STEPS) - set(CODECS)
+    if unknown:
+        raise ValueError(f"Unsupported compression: {sorted(unknown)} (expected {GEOMETRY_STEPS + CODECS})")
+    if 'gzip' in steps and 'zstd' in steps:
+        raise ValueError("Choose one of gzip or zstd")
+    return [step for step in GEOMETRY_STEPS + CODECS if step in steps]
+
+
+def content_encoding(steps):
+    """The payload codec among the steps, if any (what the client must decompress)"""
+    return next((step for step in steps if step in CODECS), None)
+
+
+def reorder_for_locality(vertices, faces):
+    """Renumber vertices in order of first use, so consecutive indices differ by small amounts"""
+    order, first_use = np.unique(faces.reshape(-1), return_index=True)
+    order = order[np.argsort(first_use)]
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return vertices[order], remap[faces]
+
+
+def _pad4(data, fill=b'\x00'):
+    return data + fill * (-len(data) % 4)
+
+
+def encode_glb(vertices, faces, quantize=False, compact_indices=False):
+    """Minimal glTF 2.0 binary writer for an untextured triangle mesh.
+
+    quantize stores positions as int16 (KHR_mesh_quantization) with the
+    dequantization in the node transform; compact_indices picks the narrowest
+    index type. Without either this matches trimesh's float32/uint32 layout.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+    node = {'mesh': 0}
+    extensions = []
+
+    if quantize and len(vertices):
+        low, high = vertices.min(axis=0), vertices.max(axis=0)
+        center = (low + high) / 2
+        scale = np.maximum((high - low) / 2, 1e-12) / 32767.0
+        quantized = np.round((vertices - center) / scale).astype(np.int16)
+        # Vertex attribute elements must be 4-byte aligned: pad VEC3 int16 to 8 bytes
+        position_bytes = np.pad(quantized, ((0, 0), (0, 1))).tobytes()
+        position = {'componentType': _SHORT, 'min': quantized.min(axis=0).tolist(),
+                    'max': quantized.max(axis=0).tolist()}
+        stride = 8
+        node['translation'] = center.tolist()
+        node['scale'] = scale.tolist()
+        extensions.append('KHR_mesh_quantization')
+    else:
+        floats = vertices.astype(np.float32)
+        position_bytes = floats.tobytes()
+        position = {'componentType': _FLOAT,
+                    'min': floats.min(axis=0).tolist() if len(floats) else [0.0] * 3,
+                    'max': floats.max(axis=0).tolist() if len(floats) else [0.0] * 3}
+        stride = 12
+
+    if compact_indices and len(vertices) <= 0xFF:
+        index_dtype, index_type = np.uint8, _UNSIGNED_BYTE
+    elif compact_indices and len(vertices) <= 0xFFFF:
+        index_dtype, index_type = np.uint16, _UNSIGNED_SHORT
+    else:
+        index_dtype, index_type = np.uint32, _UNSIGNED_INT
+    index_bytes = faces.astype(index_dtype).tobytes()
+
+    index_view = _pad4(index_bytes)
+    document = {
+        'asset': {'version': '2.0', 'generator': 'hunyuan3d-sagemaker'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [node],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 1}, 'indices': 0, 'mode': 4}]}],
+        'accessors': [
+            {'bufferView': 0, 'componentType': index_type, 'count': int(faces.size), 'type': 'SCALAR',
+             'min': [int(faces.min()) if faces.size else 0], 'max': [int(faces.max()) if faces.size else 0]},
+            dict(position, bufferView=1, count=len(vertices), type='VEC3'),
+        ],
+        'bufferViews': [
+            {'buffer': 0, 'byteOffset': 0, 'byteLength': len(index_bytes), 'target': _ELEMENT_ARRAY_BUFFER},
+            {'buffer': 0, 'byteOffset': len(index_view), 'byteLength': len(position_bytes),
+             'byteStride': stride, 'target': _ARRAY_BUFFER},
+        ],
+        'buffers': [{'byteLength': len(index_view) + len(position_bytes)}],
+    }
+    if extensions:
+        document['extensionsUsed'] = extensions
+        document['extensionsRequired'] = extensions
+
+    json_chunk = _pad4(json.dumps(document, separators=(',', ':')).encode(), b' ')
+    bin_chunk = _pad4(index_view + position_bytes)
+    total = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b''.join([
+        struct.pack('<4sII', b'glTF', 2, total),
+        struct.pack('<I4s', len(json_chunk), b'JSON'), json_chunk,
+        struct.pack('<I4s', len(bin_chunk), b'BIN\x00'), bin_chunk,
+    ])
+
+
+def _codec(name, data):
+    if name == 'gzip':
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression requires the zstandard package")
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def compress_mesh(mesh, file_type, steps):
+    """Export a mesh with the given compression steps.
+
+    Returns the payload and a report with the plain export size, the size
+    after each step and the seconds each step took.
+    """
+    geometry = [step for step in steps if step in GEOMETRY_STEPS]
+    codec = content_encoding(steps)
+
+    start = time.perf_counter()
+    data = export_mesh(mesh, file_type)
+    raw_bytes = len(data)
+    report = {'raw_bytes': raw_bytes, 'steps': []}
+
+    if geometry:
+        if file_type != 'glb' or getattr(mesh.visual, 'kind', None) is not None:
+            raise ValueError(f"Compression {geometry} requires an untextured glb")
+        vertices, faces = np.asarray(mesh.vertices), np.asarray(mesh.faces)
+        # Re-encode once per step so each one reports its own size and encode time
+        for count, step in enumerate(geometry, 1):
+            step_start = time.perf_counter()
+            previous = len(data)
+            if step == 'indices':
+                vertices, faces = reorder_for_locality(vertices, faces)
+            data = encode_glb(vertices, faces,
+                              quantize='quantize' in geometry[:count],
+                              compact_indices='indices' in geometry[:count])
+            report['steps'].append({'name': step, 'input_bytes': previous, 'output_bytes': len(data),
+                                    'seconds': time.perf_counter() - step_start})
+
+    if codec:
+        step_start = time.perf_counter()
+        previous = len(data)
+        data = _codec(codec, data)
+        report['steps'].append({'name': codec, 'input_bytes': previous, 'output_bytes': len(data),
+                                'seconds': time.perf_counter() - step_start})
+        report['content_encoding'] = codec
+
+    report['compressed_bytes'] = len(data)
+    report['ratio'] = len(data) / raw_bytes if raw_bytes else 1.0
+    report['seconds'] = time.perf_counter() - start
+    return data, report
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+In-memory mesh export
+"""
+import base64
+import json
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Accept types answered with the raw mesh bytes instead of base64-in-JSON
+BINARY_CONTENT_TYPES = ('model/gltf-binary', 'application/octet-stream')
+
+# Result keys holding one entry (with its own buffer) per mesh: levels of detail, seed variants
+PART_KEYS = ('lods', 'variants')
+
+
+def mesh_content_type(file_type):
+    """MIME type of an exported mesh"""
+    return 'model/gltf-binary' if file_type == 'glb' else 'application/octet-stream'
+
+
+def part_suffix(info):
+    """Name suffix of one packed part: _lod<level> or _seed<seed>"""
+    return f"_seed{info['seed']}" if 'seed' in info else f"_lod{info['level']}"
+
+
+def export_mesh(mesh, file_type='glb'):
+    """Serialize a mesh straight into bytes in the requested format.
+
+    Replaces the temp-file export / reload / re-export round trip: nothing is
+    written to disk and there is no shared output path, so concurrent requests
+    cannot clobber each other.
+    """
+    data = mesh.export(file_type=file_type)
+    # Text formats (obj, ...) come back as str
+    if isinstance(data, str):
+        data = data.encode()
+    return data
+
+
+def export_lod_scene(meshes, face_counts):
+    """One GLB holding every level of detail as its own node (LOD0 is the finest)"""
+    import trimesh
+
+    scene = trimesh.Scene()
+    for level, (mesh, face_count) in enumerate(zip(meshes, face_counts)):
+        name = f'LOD{level}_{face_count}'
+        scene.add_geometry(mesh, node_name=name, geom_name=name)
+    return export_mesh(scene, 'glb')
+
+
+def pack_parts(parts):
+    """Pack (info, bytes) pairs into one blob: uint32 header length, JSON header, then the buffers"""
+    header = json.dumps([dict(info, size=len(data)) for info, data in parts]).encode()
+    return struct.pack('<I', len(header)) + header + b''.join(data for _, data in parts)
+
+
+def unpack_parts(blob):
+    """Inverse of pack_parts, returns (info, bytes) pairs"""
+    (header_size,) = struct.unpack_from('<I', blob)
+    offset = 4 + header_size
+    parts = []
+    for info in json.loads(bytes(blob[4:offset])):
+        size = info.pop('size')
+        parts.append((info, blob[offset:offset + size]))
+        offset += size
+    return parts
+
+
+def encode_model_bytes(result):
+    """Replace raw 'model_bytes' (top level and per part) with base64 'model_base64', in place"""
+    for entry in [result] + [part for key in PART_KEYS for part in result.get(key, [])]:
+        if 'model_bytes' in entry:
+            entry['model_base64'] = base64.b64encode(entry.pop('model_bytes')).decode()
+    return result
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Latency histograms, counters and Prometheus text exposition
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds (covers ms-level encoding up to multi-minute texturing)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class Histogram:
+    """Bucketed histogram per label set, plus a sliding window of recent samples for quantiles"""
+
+    def __init__(self, name, help_text, label_name, buckets=DEFAULT_BUCKETS, window=1024):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = tuple(buckets)
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, label):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {
+                    'buckets': [0] * len(self.buckets),
+                    'count': 0,
+                    'sum': 0.0,
+                    'recent': deque(maxlen=self.window),
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['count'] += 1
+            series['sum'] += value
+            series['recent'].append(value)
+
+    def quantiles(self, label):
+        """p50/p95/p99 over the recent window"""
+        with self._lock:
+            series = self._series.get(label)
+            recent = sorted(series['recent']) if series else []
+        if not recent:
+            return {}
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        quantile_lines = [f'# HELP {self.name}_quantile {self.help_text} (recent window quantiles)',
+                          f'# TYPE {self.name}_quantile gauge']
+        with self._lock:
+            labels = sorted(self._series)
+        for label in labels:
+            with self._lock:
+                series = self._series[label]
+                buckets, count, total = list(series['buckets']), series['count'], series['sum']
+            base = ((self.label_name, label),)
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(f'{self.name}_bucket{_format_labels(base + (("le", bound),))} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_format_labels(base + (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(base)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(base)} {count}')
+            for q, value in self.quantiles(label).items():
+                quantile_lines.append(f'{self.name}_quantile{_format_labels(base + (("quantile", q),))} {value}')
+        return lines + quantile_lines
+
+
+class Counter:
+    """Monotonic counter per label value"""
+
+    def __init__(self, name, help_text, label_name):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label, value in values:
+            lines.append(f'{self.name}{_format_labels(((self.label_name, label),))} {value}')
+        return lines
+
+
+class Registry:
+    """Holds metrics and gauge collectors, renders the Prometheus text format"""
+
+    def __init__(self, prefix='hy3d'):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name, help_text, label_name, **kwargs):
+        metric = Histogram(f'{self.prefix}_{name}', help_text, label_name, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_name):
+        metric = Counter(f'{self.prefix}_{name}', help_text, label_name)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, name, collect):
+        """collect() returns a stats dict; its numeric values are exported as gauges named <prefix>_<name>_<key>.
+        Nested dicts (e.g. histograms keyed by batch size) become a 'key' label."""
+        self._collectors.append((name, collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, collect in self._collectors:
+            stats = collect()
+            if not stats:
+                continue
+            for key, value in stats.items():
+                gauge = f'{self.prefix}_{name}_{key}'
+                if isinstance(value, dict):
+                    samples = [(_format_labels((('key', k),)), v) for k, v in value.items()]
+                else:
+                    samples = [('', value)]
+                samples = [(labels, v) for labels, v in samples
+                           if isinstance(v, (int, float)) and not isinstance(v, bool)]
+                if not samples:
+                    continue
+                lines.append(f'# TYPE {gauge} gauge')
+                lines.extend(f'{gauge}{labels} {v}' for labels, v in samples)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('stage_seconds', 'Per-request stage latency in seconds', 'stage')
+REQUESTS = REGISTRY.counter('requests_total', 'Requests by final status', 'status')
+
+
+class RequestTimings:
+    """Per-request stage durations; every measurement also feeds the global stage histogram
+    unless record=False (e.g. for warmup requests)"""
+
+    def __init__(self, record=True):
+        self.stages = {}
+        self.record = record
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if self.record:
+            STAGE_SECONDS.observe(seconds, name)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
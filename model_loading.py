@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pipeline loading policies (eager, lazy, offload when idle) and startup phase timing
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('eager', 'lazy', 'offload')
+
+
+class ManagedPipeline:
+    """Owns one pipeline and decides when it is loaded and where it lives.
+
+    eager:   loaded by load(), stays on the device.
+    lazy:    loaded on first acquire(), stays on the device.
+    offload: loaded on first acquire(); moved to host memory once it has been
+             idle for idle_seconds and moved back on the next acquire().
+    """
+
+    def __init__(self, name, loader, policy='eager', idle_seconds=300, to_device=None, to_host=None, on_change=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown loading policy for {name}: {policy} (expected one of {POLICIES})")
+        self.name = name
+        self.loader = loader
+        self.policy = policy
+        self.idle_seconds = idle_seconds
+        # to_device(pipeline) / to_host(pipeline) move weights between GPU and host memory
+        self.to_device = to_device
+        self.to_host = to_host
+        # on_change(pipeline) runs after every load, offload and reload (lock held), e.g. to resize memory budgets
+        self.on_change = on_change
+
+        self.pipeline = None
+        self.on_device = False
+        self._lock = threading.RLock()
+        self._in_use = 0
+        self._last_used = time.time()
+        self._loads = 0
+        self._offloads = 0
+        self._reloads = 0
+        self._load_seconds = None
+
+        if self.policy == 'offload':
+            threading.Thread(target=self._watch_idle, name=f'{name}-offload', daemon=True).start()
+
+    @property
+    def loaded(self):
+        return self.pipeline is not None
+
+    def load(self):
+        """Load the pipeline now if it is not loaded yet"""
+        with self._lock:
+            if self.pipeline is None:
+                logger.info(f"Loading {self.name} pipeline ({self.policy})...")
+                start = time.time()
+                self.pipeline = self.loader()
+                self.on_device = True
+                self._loads += 1
+                self._load_seconds = time.time() - start
+                logger.info(f"{self.name} pipeline loaded in {self._load_seconds:.1f}s")
+                self._changed()
+            return self.pipeline
+
+    @contextmanager
+    def acquire(self):
+        """Yield the pipeline on the device, loading or restoring it if needed"""
+        with self._lock:
+            self.load()
+            if not self.on_device:
+                logger.info(f"Moving {self.name} pipeline back to the device...")
+                self.to_device(self.pipeline)
+                self.on_device = True
+                self._reloads += 1
+                self._changed()
+            self._in_use += 1
+        try:
+            yield self.pipeline
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._last_used = time.time()
+
+    def _changed(self):
+        if self.on_change is not None:
+            try:
+                self.on_change(self.pipeline)
+            except Exception as e:
+                logger.warning(f"{self.name} pipeline change callback failed: {str(e)}")
+
+    def _watch_idle(self):
+        interval = max(1.0, min(30.0, self.idle_seconds / 4))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                idle = time.time() - self._last_used
+                if self.pipeline is None or not self.on_device or self._in_use or idle < self.idle_seconds:
+                    continue
+                logger.info(f"{self.name} pipeline idle for {idle:.0f}s, offloading to host memory")
+                self.to_host(self.pipeline)
+                self.on_device = False
+                self._offloads += 1
+                self._changed()
+
+    def stats(self):
+        with self._lock:
+            if self.pipeline is None:
+                state = 'unloaded'
+            else:
+                state = 'on_device' if self.on_device else 'offloaded'
+            return {
+                'policy': self.policy,
+                'state': state,
+                'in_use': self._in_use,
+                'idle_seconds': time.time() - self._last_used,
+                'loads': self._loads,
+                'offloads': self._offloads,
+                'reloads': self._reloads,
+                'load_seconds': self._load_seconds,
+            }
+
+
+class StartupReport:
+    """Timed loading phases (resolve, download, deserialize, to_device, ...) per component"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._phases = []
+
+    @contextmanager
+    def phase(self, component, name, **info):
+        """Time a phase; the yielded dict can be filled with extra details (e.g. cache hits)"""
+        start = time.time()
+        status = 'completed'
+        try:
+            yield info
+        except Exception:
+            status = 'failed'
+            raise
+        finally:
+            end = time.time()
+            entry = dict(info, component=component, phase=name, status=status,
+                         start_offset=start - self.started_at, seconds=end - start,
+                         thread=threading.current_thread().name)
+            with self._lock:
+                self._phases.append(entry)
+            logger.info(f"[startup] {component}.{name}: {end - start:.2f}s")
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def to_dict(self):
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p['start_offset'])
+        components = {}
+        for entry in phases:
+            components[entry['component']] = components.get(entry['component'], 0.0) + entry['seconds']
+        return {
+            'total_seconds': (self.finished_at or time.time()) - self.started_at,
+            'finished': self.finished_at is not None,
+            'components': components,
+            'phases': phases,
+        }
+
+    def log(self):
+        report = self.to_dict()
+        logger.info(f"Startup report: {report['total_seconds']:.1f}s total, "
+                    + ', '.join(f"{name}={seconds:.1f}s" for name, seconds in report['components'].items()))
+        for entry in report['phases']:
+            logger.info(f"  +{entry['start_offset']:7.2f}s {entry['component']}.{entry['phase']} "
+                        f"{entry['seconds']:.2f}s [{entry['thread']}] {entry['status']}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Mesh post-processing (floater / degenerate face removal, face reduction) on a process pool
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import trimesh
+
+from metrics import RequestTimings
+
+logger = logging.getLogger(__name__)
+
+# Official order from api_server.py
+STEPS = ('floater_remover', 'degenerate_face_remover', 'face_reducer')
+
+_steps = None
+
+
+def _load_steps():
+    """Create the post-processors once per process (also the pool initializer)"""
+    global _steps
+    if _steps is None:
+        from hy3dgen.shapegen import FloaterRemover, DegenerateFaceRemover, FaceReducer
+        _steps = {
+            'floater_remover': FloaterRemover(),
+            'degenerate_face_remover': DegenerateFaceRemover(),
+            'face_reducer': FaceReducer(),
+        }
+    return _steps
+
+
+def run_steps(mesh, max_facenum=None):
+    """Apply the post-processors in order; face reduction only runs when max_facenum is set.
+
+    Returns the processed mesh and the seconds spent in each step.
+    """
+    steps = _load_steps()
+    seconds = {}
+    for name in STEPS:
+        if name == 'face_reducer' and not max_facenum:
+            continue
+        start = time.perf_counter()
+        if name == 'face_reducer':
+            mesh = steps[name](mesh, max_facenum=max_facenum)
+        else:
+            mesh = steps[name](mesh)
+        seconds[name] = time.perf_counter() - start
+    return mesh, seconds
+
+
+def run_lod_chain(mesh, face_counts):
+    """Clean the mesh once, then decimate incrementally: each level is reduced from the previous one.
+
+    face_counts must be sorted finest first. Returns one mesh per level and the step seconds.
+    """
+    steps = _load_steps()
+    mesh, seconds = run_steps(mesh)
+    levels = []
+    start = time.perf_counter()
+    for target in face_counts:
+        mesh = steps['face_reducer'](mesh, max_facenum=target)
+        levels.append(mesh)
+    seconds['face_reducer'] = time.perf_counter() - start
+    return levels, seconds
+
+
+def _to_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm
+
+
+def _postprocess_shared(spec, max_facenum=None, lod_face_counts=None):
+    """Pool worker: rebuild the mesh from shared memory, post-process it and write the result back in place.
+
+    spec maps 'vertices'/'faces' to (shm name, shape, dtype). Returns one entry
+    per output mesh mapping each array to the number of rows written back, or
+    to the array itself if it does not fit. Only the first (finest) mesh is
+    written back; coarser LOD levels are small and come back through the pipe.
+    """
+    blocks = {key: shared_memory.SharedMemory(name=name) for key, (name, _, _) in spec.items()}
+    views = None
+    try:
+        views = {key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+                 for key, (_, shape, dtype) in spec.items()}
+        mesh = trimesh.Trimesh(vertices=views['vertices'].copy(), faces=views['faces'].copy(), process=False)
+        if lod_face_counts:
+            meshes, seconds = run_lod_chain(mesh, lod_face_counts)
+        else:
+            mesh, seconds = run_steps(mesh, max_facenum)
+            meshes = [mesh]
+
+        results = []
+        for index, mesh in enumerate(meshes):
+            result = {}
+            for key, data in (('vertices', mesh.vertices), ('faces', mesh.faces)):
+                data = np.asarray(data, dtype=views[key].dtype)
+                if index == 0 and len(data) <= len(views[key]):
+                    views[key][:len(data)] = data
+                    result[key] = len(data)
+                else:
+                    result[key] = data
+            results.append(result)
+        return results, seconds
+    finally:
+        # Views must be gone before the buffers can be closed
+        views = None
+        for shm in blocks.values():
+            shm.close()
+
+
+class MeshPostprocessor:
+    """Runs the mesh post-processors on a process pool, or inline when workers=0.
+
+    Vertex and face arrays travel through shared memory and the (never larger)
+    result is written back into the same blocks, so the mesh is not pickled in
+    either direction. The calling thread only waits on a future, leaving the
+    GIL and the CPU cores to the next request's DiT sampling.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = max(0, int(workers))
+        self._executor = self._create_executor() if self.workers else None
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._in_flight = 0
+        self._processed = 0
+        self._failed = 0
+        self._rebuilds = 0
+        self._seconds = 0.0
+
+    def _create_executor(self):
+        # spawn: the parent process has CUDA initialized, which does not survive fork
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_load_steps,
+        )
+
+    def _rebuild_executor(self, broken):
+        """Replace a pool broken by a dead worker (OOM kill, native crash); only the first caller rebuilds it"""
+        with self._pool_lock:
+            if self._executor is not broken:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+        with self._lock:
+            self._rebuilds += 1
+        logger.warning("Post-processing pool lost a worker; recreated the pool")
+
+    def process(self, mesh, max_facenum=None, timings=None):
+        """Post-process a mesh; step durations are recorded under their own names"""
+        return self._run(mesh, timings, max_facenum=max_facenum)[0]
+
+    def process_lods(self, mesh, face_counts, timings=None):
+        """Post-process a mesh into several levels of detail, finest first.
+
+        Returns one mesh per entry of face_counts (which must be sorted
+        descending); each level is decimated from the previous one.
+        """
+        return self._run(mesh, timings, lod_face_counts=list(face_counts))
+
+    def _run(self, mesh, timings, max_facenum=None, lod_face_counts=None):
+        timings = timings or RequestTimings()
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self._executor is None:
+                if lod_face_counts:
+                    results, seconds = run_lod_chain(mesh, lod_face_counts)
+                else:
+                    result, seconds = run_steps(mesh, max_facenum)
+                    results = [result]
+            else:
+                results, seconds = self._process_shared(mesh, timings, max_facenum, lod_face_counts)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._seconds += time.perf_counter() - start
+
+        for name, value in seconds.items():
+            timings.add(name, value)
+        for result in results:
+            if result is not mesh:
+                result.metadata.update(mesh.metadata)
+        with self._lock:
+            self._processed += 1
+        return results
+
+    def _process_shared(self, mesh, timings, max_facenum=None, lod_face_counts=None):
+        arrays = {
+            'vertices': np.ascontiguousarray(mesh.vertices),
+            'faces': np.ascontiguousarray(mesh.faces),
+        }
+        blocks = {}
+        try:
+            with timings.stage('postprocess_transfer'):
+                for key, array in arrays.items():
+                    blocks[key] = _to_shared(array)
+            spec = {key: (blocks[key].name, array.shape, array.dtype.str) for key, array in arrays.items()}
+
+            executor = self._executor
+            try:
+                results, seconds = executor.submit(_postprocess_shared, spec, max_facenum, lod_face_counts).result()
+            except BrokenProcessPool:
+                # Retry once on a fresh pool; the dead worker may have been writing its result back
+                self._rebuild_executor(executor)
+                for key, array in arrays.items():
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=blocks[key].buf)[...] = array
+                results, seconds = self._executor.submit(
+                    _postprocess_shared, spec, max_facenum, lod_face_counts).result()
+
+            with timings.stage('postprocess_transfer'):
+                meshes = []
+                for result in results:
+                    out = {}
+                    for key, value in result.items():
+                        if isinstance(value, int):
+                            view = np.ndarray(arrays[key].shape, dtype=arrays[key].dtype, buffer=blocks[key].buf)
+                            out[key] = view[:value].copy()
+                            del view
+                        else:
+                            out[key] = value
+                    meshes.append(trimesh.Trimesh(vertices=out['vertices'], faces=out['faces'], process=False))
+        finally:
+            for shm in blocks.values():
+                shm.close()
+                shm.unlink()
+
+        return meshes, seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'in_flight': self._in_flight,
+                'processed': self._processed,
+                'failed': self._failed,
+                'pool_rebuilds': self._rebuilds,
+                'busy_seconds_sum': self._seconds,
+            }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Background-removal preprocessing: skip already-matted inputs, memoize the rest
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from metrics import RequestTimings
+
+logger = logging.getLogger(__name__)
+
+# Input images are downscaled so the longer side is at most this (0 keeps the full size);
+# the conditioner works at 512 px, the margin is for background removal and recentering
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '1024'))
+
+
+def open_image(data, max_side=None):
+    """Decode an input image, downscaled so its longer side is at most max_side.
+
+    JPEGs are decoded in draft mode: the decoder scales by 1/2, 1/4 or 1/8
+    while decoding, so an oversized photo never materializes at full size.
+    The remaining reduction (and WebP/PNG downscaling) happens after the
+    decode. EXIF orientation is applied, since phone photos are often stored
+    rotated. Returns the image and a dict describing what was done.
+    """
+    image = Image.open(BytesIO(data))
+    info = {'format': image.format, 'source_size': list(image.size)}
+    if max_side and max(image.size) > max_side and image.format == 'JPEG':
+        # The requested size is a lower bound; draft picks the largest scale that stays above it
+        scale = max_side / max(image.size)
+        image.draft('RGB', (max(1, int(image.size[0] * scale)), max(1, int(image.size[1] * scale))))
+        info['draft_size'] = list(image.size)
+    image.load()
+    image = ImageOps.exif_transpose(image)
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        # Palette and grayscale images keep their transparency for the rembg skip check
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    info['size'] = list(image.size)
+    return image, info
+
+
+def has_meaningful_alpha(image, min_fraction=0.01):
+    """True when the image already carries a usable matte.
+
+    Both clearly transparent and clearly opaque pixels must make up at least
+    min_fraction of the image; a fully opaque alpha channel is not a matte.
+    """
+    if image.mode not in ('RGBA', 'LA', 'PA') and not (image.mode == 'P' and 'transparency' in image.info):
+        return False
+    alpha = image.getchannel('A') if image.mode in ('RGBA', 'LA', 'PA') else image.convert('RGBA').getchannel('A')
+    histogram = alpha.histogram()
+    total = float(sum(histogram))
+    transparent = sum(histogram[:16]) / total
+    opaque = sum(histogram[240:]) / total
+    return transparent >= min_fraction and opaque >= min_fraction
+
+
+def image_digest(image):
+    """Content hash of the decoded pixels"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{image.mode}:{image.size}'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class BackgroundPreprocessor:
+    """Runs BackgroundRemover only when needed, on a CPU thread pool.
+
+    process() returns the matted image and how it was obtained: 'skipped'
+    (input already had an alpha matte), 'cached' (same pixels seen recently)
+    or 'computed'.
+    """
+
+    def __init__(self, remover, cache_size=64, workers=2):
+        self.remover = remover
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='rembg')
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._stats = {'skipped': 0, 'cached': 0, 'computed': 0}
+
+    def process(self, image, timings=None):
+        timings = timings or RequestTimings()
+        with timings.stage('rembg'):
+            if has_meaningful_alpha(image):
+                status = 'skipped'
+                if image.mode != 'RGBA':
+                    image = image.convert('RGBA')
+            else:
+                key = image_digest(image)
+                with self._lock:
+                    cached = self._cache.get(key)
+                    if cached is not None:
+                        self._cache.move_to_end(key)
+                if cached is not None:
+                    status, image = 'cached', cached
+                else:
+                    # Off the request thread so it overlaps GPU work from other requests
+                    image = self._executor.submit(self.remover, image).result()
+                    status = 'computed'
+                    if self.cache_size > 0:
+                        with self._lock:
+                            self._cache[key] = image
+                            while len(self._cache) > self.cache_size:
+                                self._cache.popitem(last=False)
+
+        with self._lock:
+            self._stats[status] += 1
+        return image, status
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cache_entries=len(self._cache), cache_size=self.cache_size)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generated meshes
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(image_bytes, params):
+    """Hash of the decoded image bytes and the canonicalized generation parameters"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(params, sort_keys=True, separators=(',', ':')).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier LRU cache of exported mesh bytes.
+
+    The in-memory tier and the optional on-disk tier each have their own byte
+    budget; least recently used entries are evicted once a budget is exceeded.
+    Disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_memory_bytes=256 * 1024 ** 2, disk_dir=None, max_disk_bytes=5 * 1024 ** 3):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes if disk_dir else 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f'{key}.bin')
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU from existing files, oldest access first"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith('.bin'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_atime, name[:-len('.bin')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        logger.info(f"Result cache disk tier: {len(self._disk)} entries, {self._disk_bytes} bytes")
+
+    def get(self, key):
+        """Return cached bytes or None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._drop_disk(key)
+                else:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._stats['disk_hits'] += 1
+                    self._put_memory(key, data)
+                    return data
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._put_memory(key, data)
+
+        if self.disk_dir and len(data) <= self.max_disk_bytes:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+                    tmp.write(data)
+                os.replace(tmp.name, path)
+            except OSError as e:
+                logger.warning(f"Failed to write result cache entry: {str(e)}")
+                return
+            with self._lock:
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+                self._evict_disk()
+
+    def _put_memory(self, key, data):
+        """Insert into the memory tier (lock held)"""
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats['memory_evictions'] += 1
+
+    def _drop_disk(self, key):
+        """Forget a disk entry and remove its file (lock held)"""
+        size = self._disk.pop(key, None)
+        if size is None:
+            return
+        self._disk_bytes -= size
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._drop_disk(key)
+            self._stats['disk_evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                max_memory_bytes=self.max_memory_bytes,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_bytes,
+                max_disk_bytes=self.max_disk_bytes,
+            )
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Small S3 helpers shared by the serving code
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+_s3_client = None
+_part_executor = None
+_part_executor_lock = threading.Lock()
+
+# Multipart parts must be at least 5 MB (except the last one)
+MIN_PART_SIZE = 5 * 1024 ** 2
+
+
+def get_s3_client():
+    """Shared boto3 S3 client (S3_ENDPOINT_URL points it at a local S3 stand-in)"""
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        _s3_client = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None)
+    return _s3_client
+
+
+def parse_s3_uri(uri):
+    """Split s3://bucket/key into (bucket, key)"""
+    parsed = urlparse(str(uri))
+    if parsed.scheme != 's3' or not parsed.netloc:
+        raise ValueError(f"Not an S3 URI: {uri}")
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+def suffixed_uri(uri, suffix):
+    """Insert suffix before the extension: s3://b/model.glb + _lod1 -> s3://b/model_lod1.glb"""
+    root, ext = os.path.splitext(uri)
+    return f'{root}{suffix}{ext}'
+
+
+def read_bytes(uri, max_bytes=None, part_size=8 * 1024 ** 2, concurrency=4, chunk_size=1024 ** 2):
+    """Read an S3 object into memory.
+
+    The size is checked with HEAD first, so objects over max_bytes are
+    rejected without downloading them. Small objects are streamed in chunks
+    into one preallocated buffer; objects larger than part_size are fetched
+    as concurrent ranged GETs.
+    """
+    bucket, key = parse_s3_uri(uri)
+    client = get_s3_client()
+    size = client.head_object(Bucket=bucket, Key=key)['ContentLength']
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(f"{uri} is {size} bytes, over the {max_bytes} byte limit")
+
+    data = bytearray(size)
+
+    def fetch(start, end):
+        # end is exclusive; the Range header is inclusive
+        body = client.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end - 1}')['Body']
+        offset = start
+        for chunk in body.iter_chunks(chunk_size=chunk_size):
+            data[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        if offset != end:
+            raise IOError(f"Short read from {uri}: got {offset - start} of {end - start} bytes at {start}")
+
+    ranges = [(start, min(start + part_size, size)) for start in range(0, size, part_size)]
+    if len(ranges) <= 1:
+        if size:
+            fetch(0, size)
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(ranges)), thread_name_prefix='s3-read') as pool:
+            list(pool.map(lambda part: fetch(*part), ranges))
+    return bytes(data)
+
+
+def read_json(uri):
+    """Read a JSON document from S3"""
+    bucket, key = parse_s3_uri(uri)
+    body = get_s3_client().get_object(Bucket=bucket, Key=key)['Body']
+    return json.loads(body.read())
+
+
+def write_json(uri, payload):
+    """Write a JSON document to S3"""
+    bucket, key = parse_s3_uri(uri)
+    get_s3_client().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(payload).encode(),
+        ContentType='application/json',
+    )
+    logger.info(f"Wrote {uri}")
+    return uri
+
+
+def _part_pool():
+    """Threads uploading multipart parts, shared by all writers"""
+    global _part_executor
+    with _part_executor_lock:
+        if _part_executor is None:
+            workers = int(os.environ.get('S3_UPLOAD_CONCURRENCY', '8'))
+            _part_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s3-part')
+        return _part_executor
+
+
+class MultipartWriter:
+    """File-like writer that uploads to S3 while data is still being written.
+
+    Every full part_size of buffered data is uploaded as a multipart part on
+    a shared thread pool, with at most max_in_flight parts of this writer in
+    memory at once. Objects smaller than one part are sent with a single
+    PUT. close() completes the upload and returns the URI, size and SHA-256
+    of the content; an exception inside the with block aborts it.
+    """
+
+    def __init__(self, uri, content_type=None, content_encoding=None, part_size=8 * 1024 ** 2, max_in_flight=4):
+        self.uri = uri
+        self.bucket, self.key = parse_s3_uri(uri)
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.extra = {}
+        if content_type:
+            self.extra['ContentType'] = content_type
+        if content_encoding:
+            self.extra['ContentEncoding'] = content_encoding
+        self.client = get_s3_client()
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self.result = None
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._submit(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _submit(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.extra)['UploadId']
+        number = len(self._parts) + 1
+        # Blocks when max_in_flight parts are pending, so a fast writer cannot buffer the whole object
+        self._slots.acquire()
+        future = _part_pool().submit(self._upload_part, number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._parts.append(future)
+
+    def _upload_part(self, number, body):
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                           PartNumber=number, Body=body)
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def close(self):
+        if self.result is not None:
+            return self.result
+        if self._upload_id is None:
+            response = self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), **self.extra)
+        else:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+            parts = [future.result() for future in self._parts]
+            response = self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': parts})
+        self._buffer = bytearray()
+        self.result = {
+            'output_uri': self.uri,
+            'size': self.size,
+            'sha256': self._sha256.hexdigest(),
+            'etag': response.get('ETag', '').strip('"'),
+        }
+        logger.info(f"Wrote {self.uri} ({self.size} bytes, {len(self._parts) or 1} parts)")
+        return self.result
+
+    def abort(self):
+        if self._upload_id is not None:
+            for future in self._parts:
+                future.cancel()
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload of {self.uri}: {str(e)}")
+            self._upload_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return False
+        try:
+            self.close()
+        except Exception:
+            self.abort()
+            raise
+        return False
+
+
+def upload_bytes(uri, data, content_type=None, content_encoding=None):
+    """Upload bytes through a MultipartWriter; returns its result (URI, size, SHA-256, ETag)"""
+    view = memoryview(data)
+    with MultipartWriter(uri, content_type=content_type, content_encoding=content_encoding) as writer:
+        for offset in range(0, len(view), writer.part_size):
+            writer.write(view[offset:offset + writer.part_size])
+    return writer.result
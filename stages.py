@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Staged execution: each pipeline stage gets its own queue and dedicated workers
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A pipeline stage with its own worker pool, concurrency limit and queue metrics.
+
+    Requests flow through stages in order, so while one request occupies the
+    texture stage the next request's shape generation proceeds in the shape stage.
+    """
+
+    def __init__(self, name, fn, concurrency=1):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, int(concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f'{name}-stage')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._max_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_seconds = 0.0
+        self._busy_seconds = 0.0
+
+    def submit(self, *args, **kwargs):
+        """Queue a call to the stage function, returns a Future"""
+        enqueued_at = time.time()
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        return self._executor.submit(self._call, enqueued_at, args, kwargs)
+
+    def run(self, *args, **kwargs):
+        """Run the stage function on a stage worker and wait for its result"""
+        return self.submit(*args, **kwargs).result()
+
+    def _call(self, enqueued_at, args, kwargs):
+        started = time.time()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_seconds += started - enqueued_at
+        failed = False
+        try:
+            return self.fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._busy_seconds += time.time() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queued
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue_depth': self._queued,
+                'max_queue_depth': self._max_queued,
+                'active': self._active,
+                'completed': self._completed,
+                'failed': self._failed,
+                'queue_wait_seconds_sum': self._wait_seconds,
+                'busy_seconds_sum': self._busy_seconds,
+            }